@@ -12,6 +12,49 @@ function initWs() {
     socket.on('connect', () => {
         console.log("WebSocket connection established");
         joinQuizRooms(); 
+
+        const pollResults = document.getElementById('poll-results');
+        if (pollResults) {
+            socket.emit('joinPoll', { pollId: pollResults.dataset.pollId });
+        }
+        if (document.getElementById('leaderboard')) {
+            socket.emit('joinLeaderboard');
+        }
+    });
+
+    socket.on('leaderboard', (data) => {
+        const leaderboard = document.getElementById('leaderboard');
+        if (!leaderboard) {
+            return;
+        }
+        leaderboard.innerHTML = "";
+        data.leaders.forEach((leader) => {
+            const listItem = document.createElement("li");
+            const name = document.createElement("strong");
+            name.textContent = leader.username;
+            listItem.append(name, `: ${leader.correct}/${leader.total} correct, best streak ${leader.best_streak}`);
+            leaderboard.appendChild(listItem);
+        });
+    });
+
+    socket.on('poll_results', (data) => {
+        const pollResults = document.getElementById('poll-results');
+        if (!pollResults || pollResults.dataset.pollId !== data.poll_id) {
+            return;
+        }
+
+        const total = Object.values(data.results).reduce((sum, count) => sum + count, 0);
+        const totalElement = document.getElementById('poll-total');
+        if (totalElement) {
+            totalElement.textContent = total;
+        }
+        pollResults.querySelectorAll('[data-choice]').forEach((item) => {
+            const count = data.results[item.dataset.choice] || 0;
+            const percentElement = item.querySelector('.poll-percent');
+            if (percentElement && total > 0) {
+                percentElement.textContent = `${(count / total) * 100}%`;
+            }
+        });
     });
 
     socket.on('new_comment', (data) => {
@@ -25,7 +68,7 @@ function initWs() {
     socket.on('like_quiz', (data) => {
         const likeCountElement = document.querySelector(`#like-count-${data.quiz_id}`);
         if (likeCountElement) {
-            likeCountElement.textContent = data.likes_users.length;
+            likeCountElement.textContent = data.likes_count;
         }
     });
 
@@ -56,25 +99,33 @@ function initWs() {
         console.error("WebSocket error:", error);
     });
 
-    const timerElement = document.getElementById('timer');
+    socket.on("reset_schedule", (data) => {
+        resetAt = data.reset_at;
+        clockOffset = data.server_time - Date.now();
+        updateTimer();
+    });
 
-    socket.on("update_timer", (data) => {
-        const timeLeft = data.time_left;
+}
 
-        if (timeLeft >= 0) {
-            const hours = Math.floor(timeLeft / 3600);
-            const minutes = Math.floor((timeLeft % 3600) / 60);
-            const seconds = timeLeft % 60;
+let resetAt = null;
+let clockOffset = 0;
 
-            timerElement.textContent = `${hours.toString().padStart(2, '0')}:${minutes.toString().padStart(2, '0')}:${seconds.toString().padStart(2, '0')}`;
-        } else {
-            timerElement.textContent = "00:00:00";
-        }
-    });
+function updateTimer() {
+    const timerElement = document.getElementById('timer');
+    if (!timerElement || resetAt === null) {
+        return;
+    }
+
+    const timeLeft = Math.max(0, Math.floor((resetAt - (Date.now() + clockOffset)) / 1000));
+    const hours = Math.floor(timeLeft / 3600);
+    const minutes = Math.floor((timeLeft % 3600) / 60);
+    const seconds = timeLeft % 60;
 
+    timerElement.textContent = `${hours.toString().padStart(2, '0')}:${minutes.toString().padStart(2, '0')}:${seconds.toString().padStart(2, '0')}`;
 }
-function joinQuizRooms() {
-    const quizItems = document.querySelectorAll('[data-quiz-id]');
+
+function joinQuizRooms(root = document) {
+    const quizItems = root.querySelectorAll('[data-quiz-id]');
     quizItems.forEach((quizItem) => {
         const quizId = quizItem.getAttribute('data-quiz-id');
         socket.emit('joinRoom', { quizId }); 
@@ -82,12 +133,72 @@ function joinQuizRooms() {
     });
 }
 
+let loadingQuizzes = false;
+
+function loadMoreQuizzes() {
+    const quizzesList = document.getElementById('quizzes-list');
+    const loadMoreButton = document.getElementById('load-more-quizzes');
+    const cursor = quizzesList ? quizzesList.dataset.nextCursor : '';
+    if (!cursor || loadingQuizzes) {
+        return;
+    }
+
+    loadingQuizzes = true;
+    fetch(`/dashboard/quizzes?before=${encodeURIComponent(cursor)}`)
+        .then((response) => response.json())
+        .then((data) => {
+            if (!data.success) {
+                return;
+            }
+            const page = document.createElement('ul');
+            page.innerHTML = data.html;
+            if (socket && socket.connected) {
+                joinQuizRooms(page);
+            }
+            quizzesList.append(...page.children);
+
+            quizzesList.dataset.nextCursor = data.next_cursor || '';
+            if (!data.next_cursor && loadMoreButton) {
+                loadMoreButton.style.display = 'none';
+            }
+        })
+        .catch((error) => console.error('Error loading quizzes:', error))
+        .finally(() => {
+            loadingQuizzes = false;
+        });
+}
+
+function initInfiniteScroll() {
+    const loadMoreButton = document.getElementById('load-more-quizzes');
+    if (loadMoreButton) {
+        loadMoreButton.addEventListener('click', loadMoreQuizzes);
+    }
+
+    const sentinel = document.getElementById('quizzes-sentinel');
+    if (sentinel && 'IntersectionObserver' in window) {
+        const observer = new IntersectionObserver((entries) => {
+            if (entries.some((entry) => entry.isIntersecting)) {
+                loadMoreQuizzes();
+            }
+        });
+        observer.observe(sentinel);
+    }
+}
+
 function likeQuiz(quizId) {
     fetch('/interact', {
         method: 'POST',
         headers: { 'Content-Type': 'application/x-www-form-urlencoded' },
         body: `quiz_id=${quizId}&type=like`
-    }).catch(error => console.error('Error during like/unlike:', error));
+    })
+        .then((response) => response.json())
+        .then((data) => {
+            const likeCountElement = document.querySelector(`#like-count-${quizId}`);
+            if (data.success && likeCountElement) {
+                likeCountElement.textContent = data.likes_count;
+            }
+        })
+        .catch(error => console.error('Error during like/unlike:', error));
 }
 
 function submitComment(event, quizId) {
@@ -113,6 +224,37 @@ function submitComment(event, quizId) {
     });
 }
 
+function loadOlderComments(quizId) {
+    const button = document.getElementById(`load-older-comments-${quizId}`);
+    const commentsList = document.getElementById(`comments-list-${quizId}`);
+    if (!button || !commentsList || !button.dataset.before) {
+        return;
+    }
+
+    fetch(`/comments/${quizId}?before=${encodeURIComponent(button.dataset.before)}`)
+        .then((response) => response.json())
+        .then((data) => {
+            if (!data.success) {
+                return;
+            }
+            const olderComments = document.createDocumentFragment();
+            data.comments.forEach((comment) => {
+                const listItem = document.createElement("li");
+                const author = document.createElement("strong");
+                author.textContent = comment.username;
+                listItem.append(author, `: ${comment.text}`);
+                olderComments.appendChild(listItem);
+            });
+            commentsList.prepend(olderComments);
+
+            button.dataset.before = data.next_cursor || '';
+            if (!data.next_cursor) {
+                button.style.display = 'none';
+            }
+        })
+        .catch((error) => console.error('Error loading comments:', error));
+}
+
 function showLikes(quizId) {
     const modal = document.getElementById(`likes-modal-${quizId}`);
     if (!modal) {
@@ -120,6 +262,23 @@ function showLikes(quizId) {
         return;
     }
     modal.style.display = "block"; 
+
+    fetch(`/likes/${quizId}`)
+        .then((response) => response.json())
+        .then((data) => {
+            const likesList = document.getElementById(`likes-list-${quizId}`);
+            if (!likesList || !data.success) {
+                return;
+            }
+            likesList.innerHTML = "";
+            const likesUsers = data.likes_users.length ? data.likes_users : ["No likes yet"];
+            likesUsers.forEach((user) => {
+                const listItem = document.createElement("li");
+                listItem.textContent = user;
+                likesList.appendChild(listItem);
+            });
+        })
+        .catch((error) => console.error('Error loading likes:', error));
 }
 
 function closeLikesModal(quizId) {
@@ -152,6 +311,8 @@ function showDetails(quizId){
 
 document.addEventListener('DOMContentLoaded', () => {
     initWs(); 
+    initInfiniteScroll();
+    setInterval(updateTimer, 1000);
 
     const addQuestionButton = document.getElementById("add-question-button");
     if (addQuestionButton) {
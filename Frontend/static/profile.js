@@ -17,7 +17,7 @@ async function handleUploadPfp(event) {
                 alert(result.message || 'File uploaded successfully!');
                 // Update the displayed profile picture if a new URL is returned
                 if (result.profile_picture) {
-                    const profileImg = document.getElementById('profilePicture');
+                    const profileImg = document.querySelector('.pfp');
                     if (profileImg) {
                         profileImg.src = result.profile_picture;
                     }
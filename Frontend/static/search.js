@@ -0,0 +1,45 @@
+let loadingResults = false;
+
+function loadMoreResults() {
+    const resultsList = document.getElementById('search-results');
+    const loadMoreButton = document.getElementById('load-more-results');
+    const cursor = resultsList ? resultsList.dataset.nextCursor : '';
+    if (!cursor || loadingResults) {
+        return;
+    }
+
+    // Same q/creator/sort as the page, plus the cursor for the next page.
+    const params = new URLSearchParams(window.location.search);
+    params.set('cursor', cursor);
+
+    loadingResults = true;
+    fetch(`/search/results?${params.toString()}`)
+        .then((response) => response.json())
+        .then((data) => {
+            if (!data.success) {
+                return;
+            }
+            const page = document.createElement('ul');
+            page.innerHTML = data.html;
+            if (socket && socket.connected) {
+                joinQuizRooms(page);
+            }
+            resultsList.append(...page.children);
+
+            resultsList.dataset.nextCursor = data.next_cursor || '';
+            if (!data.next_cursor && loadMoreButton) {
+                loadMoreButton.style.display = 'none';
+            }
+        })
+        .catch((error) => console.error('Error loading search results:', error))
+        .finally(() => {
+            loadingResults = false;
+        });
+}
+
+document.addEventListener('DOMContentLoaded', () => {
+    const loadMoreButton = document.getElementById('load-more-results');
+    if (loadMoreButton) {
+        loadMoreButton.addEventListener('click', loadMoreResults);
+    }
+});
@@ -1,85 +1,629 @@
-from flask import Flask, render_template, request, redirect, make_response, send_file, jsonify, url_for, send_from_directory
-from flask_socketio import SocketIO, emit
+import os
+
+# Green-thread servers have to patch the standard library before anything else
+# (pymongo included) imports socket or threading.
+SERVER_MODE = os.environ.get("SERVER_MODE", "threading")
+if SERVER_MODE == "eventlet":
+    import eventlet
+    eventlet.monkey_patch()
+elif SERVER_MODE == "gevent":
+    from gevent import monkey
+    monkey.patch_all()
+
+from flask import Flask, render_template, request, redirect, make_response, jsonify, url_for, send_from_directory, Response, stream_with_context, g
+from flask_socketio import SocketIO, emit, join_room, leave_room
+from socketio import PubSubManager
 from flask_pymongo import PyMongo
-from flask_bcrypt import Bcrypt
-from pymongo import MongoClient
+from pymongo import monitoring
+from pymongo import MongoClient, ASCENDING, DESCENDING, TEXT, ReturnDocument, CursorType, UpdateOne, ReplaceOne
+from pymongo.errors import PyMongoError, CollectionInvalid, DuplicateKeyError, BulkWriteError
 from bson import ObjectId
+from bson.errors import InvalidId
+from markupsafe import Markup
+from werkzeug.exceptions import NotFound, RequestEntityTooLarge
+from werkzeug.utils import safe_join
+from PIL import Image, ImageOps
+import bcrypt
 import hashlib
-import os
-import uuid
-from html import escape
+import json
+import logging
+import mimetypes
+import re
+import tempfile
+from html import escape, unescape
 import time
-from random import choice
+from random import choice, random
 from datetime import datetime, timedelta
 import threading
+import atexit
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from collections import OrderedDict
+import queue
 import pytz
 
 app = Flask(__name__, template_folder='Frontend', static_folder='Frontend/static')
 app.config['UPLOAD_FOLDER'] = 'Frontend/uploads'
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode="threading", transports=['websocket'])
 
-bcrypt = Bcrypt(app)
+logger = logging.getLogger("bigbrain")
+if not logger.handlers:
+    log_handler = logging.StreamHandler()
+    log_handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(log_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+# Fraction of requests that get a structured access log line.
+LOG_SAMPLE_RATE = float(os.environ.get("LOG_SAMPLE_RATE", 0.01))
+
+def log_event(event, **fields):
+    logger.info(json.dumps(dict(fields, event=event, ts=round(time.time(), 3)), default=str))
+
+# Minimal Prometheus metrics, exposed on /metrics. Values are per process;
+# scrape every worker (or sum them) when running several.
+class Metric:
+    def __init__(self, name, help_text, metric_type):
+        self.name = name
+        self.help_text = help_text
+        self.metric_type = metric_type
+        self._lock = threading.Lock()
+        METRICS.append(self)
+
+    @staticmethod
+    def _format_labels(labels, extra=()):
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ""
+        escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+        return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.metric_type}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    def __init__(self, name, help_text):
+        super().__init__(name, help_text, "counter")
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        with self._lock:
+            values = dict(self._values)
+        return [f"{self.name}{self._format_labels(k)} {v}" for k, v in sorted(values.items())]
+
+
+class Gauge(Metric):
+    def __init__(self, name, help_text):
+        super().__init__(name, help_text, "gauge")
+        self._value = 0
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def _samples(self):
+        return [f"{self.name} {self._value}"]
+
+
+class Histogram(Metric):
+    DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, "histogram")
+        self.buckets = buckets
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def _samples(self):
+        with self._lock:
+            snapshot = {k: list(v) for k, v in self._series.items()}
+        lines = []
+        for key, series in sorted(snapshot.items()):
+            for i, bound in enumerate(self.buckets):
+                lines.append(f"{self.name}_bucket{self._format_labels(key, [('le', bound)])} {series[i]}")
+            lines.append(f"{self.name}_bucket{self._format_labels(key, [('le', '+Inf')])} {series[-1]}")
+            lines.append(f"{self.name}_sum{self._format_labels(key)} {series[-2]}")
+            lines.append(f"{self.name}_count{self._format_labels(key)} {series[-1]}")
+        return lines
+
+
+METRICS = []
+REQUEST_LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency by route.")
+MONGO_COMMANDS = Counter("mongo_commands_total", "MongoDB commands by name and outcome.")
+MONGO_COMMAND_LATENCY = Histogram("mongo_command_duration_seconds", "MongoDB command latency by name.")
+SOCKET_CONNECTIONS = Gauge("socketio_connections", "Currently connected Socket.IO clients.")
+SOCKET_EMITS = Counter("socketio_emits_total", "Socket.IO events emitted by name.")
+RATE_LIMIT_BLOCKS = Counter("rate_limit_blocks_total", "Requests rejected by the rate limiter.")
+BCRYPT_IN_FLIGHT = Gauge("bcrypt_pool_in_flight", "Password hashes running or queued in the bcrypt pool.")
+BCRYPT_REJECTIONS = Counter("bcrypt_pool_rejections_total", "Password hashes rejected because the pool queue was full.")
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_COMMANDS.inc(command=event.command_name, outcome="success")
+        MONGO_COMMAND_LATENCY.observe(event.duration_micros / 1e6, command=event.command_name)
+
+    def failed(self, event):
+        MONGO_COMMANDS.inc(command=event.command_name, outcome="failure")
+        MONGO_COMMAND_LATENCY.observe(event.duration_micros / 1e6, command=event.command_name)
+
+
+# Registered before the rate limiter so blocked requests are timed too.
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.get("request_started")
+    if started is not None:
+        duration = time.perf_counter() - started
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        REQUEST_LATENCY.observe(duration, route=route, method=request.method, status=response.status_code)
+        if random() < LOG_SAMPLE_RATE:
+            log_event(
+                "request",
+                method=request.method,
+                path=request.path,
+                route=route,
+                status=response.status_code,
+                duration_ms=round(duration * 1000, 2),
+                ip=client_ip(),
+            )
+    return response
 
-mongo_client = MongoClient('mongo')
+@app.route("/metrics")
+def metrics():
+    body = "\n".join(metric.render() for metric in METRICS) + "\n"
+    return Response(body, mimetype="text/plain; version=0.0.4")
+
+# Socket.IO fan-out between app processes. Every emit is published to the
+# queue and each node delivers it to its own connected clients.
+#
+# Messages are JSON, never pickle: anyone who can write to the queue could
+# otherwise run code on every node.
+#
+# Mongo-backed queue: a capped collection read with a tailable cursor, so
+# multi-node deployments need no broker besides the database they already run.
+class MongoPubSubManager(PubSubManager):
+    name = "mongo"
+
+    def __init__(self, url, channel="socketio", write_only=False, logger=None, size=16 * 1024 * 1024):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.client = MongoClient(url, connect=False)
+        self.size = size
+        self._collection = None
+
+    def _get_collection(self):
+        if self._collection is None:
+            database = self.client.get_default_database(os.environ.get("MONGO_DB", "user_auth_db"))
+            try:
+                database.create_collection(self.channel, capped=True, size=self.size)
+            except CollectionInvalid:
+                pass
+            self._collection = database[self.channel]
+        return self._collection
+
+    def _publish(self, data):
+        self._get_collection().insert_one({"message": self.json.dumps(data)})
+
+    def _listen(self):
+        collection = self._get_collection()
+        latest = collection.find_one(sort=[("$natural", -1)])
+        last_id = latest["_id"] if latest else None
+        while True:
+            query = {"_id": {"$gt": last_id}} if last_id else {}
+            cursor = collection.find(query, cursor_type=CursorType.TAILABLE_AWAIT)
+            while cursor.alive:
+                for document in cursor:
+                    last_id = document["_id"]
+                    yield document["message"]
+            # A tailable cursor on an empty collection dies straight away.
+            time.sleep(0.1)
+
+
+# In-process stand-in: every SocketIO server in this process that uses the same
+# channel sees the others' emits. Useful for running several "nodes" in one
+# process in tests and benchmarks.
+class LocalPubSubManager(PubSubManager):
+    name = "local"
+    subscribers = {}
+    subscribers_lock = threading.Lock()
+
+    def __init__(self, url="local://", channel="socketio", write_only=False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+
+    def _publish(self, data):
+        message = self.json.dumps(data)
+        with self.subscribers_lock:
+            subscribers = list(self.subscribers.get(self.channel, []))
+        for subscriber in subscribers:
+            subscriber.put(message)
+
+    def _listen(self):
+        subscriber = queue.Queue()
+        with self.subscribers_lock:
+            self.subscribers.setdefault(self.channel, []).append(subscriber)
+        while True:
+            yield subscriber.get()
+
+
+def socketio_queue_options(url, channel):
+    if not url:
+        return {}
+    if url.startswith(("mongodb://", "mongodb+srv://")):
+        return {"client_manager": MongoPubSubManager(url, channel=channel)}
+    if url.startswith("local://"):
+        return {"client_manager": LocalPubSubManager(url, channel=channel)}
+    # redis://, amqp://, kafka:// and zmq+tcp:// are handled by Flask-SocketIO.
+    return {"message_queue": url, "channel": channel}
+
+# Websocket-only transport keeps each client on one connection to one node, so
+# the load balancer needs no sticky sessions. Enabling "polling" requires
+# sticky sessions (e.g. nginx ip_hash) because a polling client's requests must
+# all reach the node that holds its session.
+socketio = SocketIO(
+    app,
+    cors_allowed_origins="*",
+    async_mode=SERVER_MODE,
+    transports=os.environ.get("SOCKETIO_TRANSPORTS", "websocket").split(","),
+    **socketio_queue_options(
+        os.environ.get("SOCKETIO_MESSAGE_QUEUE"),
+        os.environ.get("SOCKETIO_CHANNEL", "socketio"),
+    )
+)
 
-db = mongo_client['user_auth_db']
+# connect=False defers opening sockets and monitor threads until first use, so
+# a client created at import time is safe across gunicorn's fork.
+mongo_client = MongoClient(os.environ.get("MONGO_URI", "mongo"), connect=False, event_listeners=[MongoCommandMetrics()])
+
+db = mongo_client[os.environ.get("MONGO_DB", "user_auth_db")]
 users_collection = db['users']
 quizzes_collection = db['quizzes']
 interactions_collection = db['interactions']
 polls_collection = db['polls']
+rate_limits_collection = db['rate_limits']
+comments_collection = db['comments']
+user_stats_collection = db['user_stats']
+
+# (collection, keys, options) created once at startup by ensure_indexes().
+INDEXES = [
+    (users_collection, [("auth_token", ASCENDING)], {"sparse": True}),
+    (users_collection, [("username", ASCENDING)], {"unique": True}),
+    (users_collection, [("email", ASCENDING)], {"unique": True}),
+    (rate_limits_collection, [("expires_at", ASCENDING)], {"expireAfterSeconds": 0}),
+    (interactions_collection, [("quiz_id", ASCENDING), ("username", ASCENDING), ("type", ASCENDING)],
+     {"unique": True, "partialFilterExpression": {"type": "like"}}),
+    (interactions_collection, [("poll_id", ASCENDING), ("username", ASCENDING)],
+     {"unique": True, "partialFilterExpression": {"type": "vote"}}),
+    (polls_collection, [("date", ASCENDING)], {"unique": True}),
+    (comments_collection, [("quiz_id", ASCENDING), ("_id", ASCENDING)], {}),
+    (quizzes_collection, [("title", TEXT), ("question_texts", TEXT)],
+     {"name": "quiz_search", "weights": {"title": 10, "question_texts": 1}}),
+    (quizzes_collection, [("likes", DESCENDING), ("_id", DESCENDING)], {}),
+    (quizzes_collection, [("created_by", ASCENDING), ("_id", DESCENDING)], {}),
+    (user_stats_collection, [("username", ASCENDING)], {"unique": True}),
+    (user_stats_collection, [("correct", DESCENDING), ("best_streak", DESCENDING), ("username", ASCENDING)], {}),
+]
+
+# The like and vote toggles rely on these unique indexes to reject a second
+# interaction, so the app must not serve without them. The build fails while
+# old duplicates remain; the named command removes them.
+REQUIRED_INDEXES = {
+    ("interactions", ("quiz_id", "username", "type")): "reconcile-likes",
+    ("interactions", ("poll_id", "username")): "reconcile-polls",
+}
+
+def ensure_indexes():
+    for collection, keys, options in INDEXES:
+        try:
+            collection.create_index(keys, **options)
+        except PyMongoError as e:
+            command = REQUIRED_INDEXES.get((collection.name, tuple(key for key, _ in keys)))
+            if command:
+                raise RuntimeError(
+                    f"Could not create unique index {keys} on {collection.name}: {e}. "
+                    f"Run `flask --app app {command}` to remove duplicate interactions, then start again."
+                ) from e
+            logger.warning(f"Could not create index {keys} on {collection.name}: {e}")
+
+
+# Thread-safe LRU cache whose entries also expire after `ttl` seconds.
+class TTLCache:
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+SESSION_CACHE_SIZE = int(os.environ.get("SESSION_CACHE_SIZE", 10000))
+SESSION_CACHE_TTL = int(os.environ.get("SESSION_CACHE_TTL", 60))
+
+# Hashed auth token -> {"_id", "username"}. Entries are dropped on logout and
+# when login re-issues a token; the TTL bounds how long another worker can
+# keep serving a session that was revoked elsewhere.
+session_cache = TTLCache(SESSION_CACHE_SIZE, SESSION_CACHE_TTL)
+
+
+RATE_LIMIT_REQUESTS = int(os.environ.get("RATE_LIMIT_REQUESTS", 50))
+RATE_LIMIT_WINDOW = int(os.environ.get("RATE_LIMIT_WINDOW", 10))
+RATE_LIMIT_BLOCK_SECONDS = int(os.environ.get("RATE_LIMIT_BLOCK_SECONDS", 30))
+app.config["RATE_LIMIT_ENABLED"] = os.environ.get("RATE_LIMIT_ENABLED", "1") != "0"
+app.config["RATE_LIMIT_SKIP_STATIC"] = os.environ.get("RATE_LIMIT_SKIP_STATIC", "1") != "0"
+
+# Both limiters use a sliding-window counter: the request count of the current
+# fixed window plus the previous window's count weighted by how much of it still
+# overlaps the sliding window. That is two integers per key instead of a list of
+# timestamps, and the same 50 requests / 10s budget as before.
+class MemoryRateLimiter:
+    def __init__(self, limit, window, block_seconds, sweep_interval=60):
+        self.limit = limit
+        self.window = window
+        self.block_seconds = block_seconds
+        self.sweep_interval = sweep_interval
+        self._counters = {}  # key -> [window index, count, previous count]
+        self._blocked = {}   # key -> blocked until
+        self._lock = threading.Lock()
+        self._next_sweep = time.time() + sweep_interval
+
+    def allow(self, key):
+        now = time.time()
+        index = int(now // self.window)
+        with self._lock:
+            if now >= self._next_sweep:
+                self._sweep(now, index)
+
+            blocked_until = self._blocked.get(key)
+            if blocked_until is not None:
+                if now < blocked_until:
+                    return False
+                del self._blocked[key]
+
+            counter = self._counters.get(key)
+            if counter is None or index - counter[0] > 1:
+                counter = [index, 0, 0]
+                self._counters[key] = counter
+            elif counter[0] != index:
+                counter[:] = [index, 0, counter[1]]
+            counter[1] += 1
+
+            overlap = 1 - (now % self.window) / self.window
+            if counter[1] + counter[2] * overlap > self.limit:
+                self._blocked[key] = now + self.block_seconds
+                return False
+            return True
+
+    def _sweep(self, now, index):
+        for key in [k for k, c in self._counters.items() if index - c[0] > 1]:
+            del self._counters[key]
+        for key in [k for k, until in self._blocked.items() if until <= now]:
+            del self._blocked[key]
+        self._next_sweep = now + self.sweep_interval
+
+
+# Shares counters between workers through a TTL collection: one document per
+# key, updated with a single pipeline find_one_and_update per request.
+class MongoRateLimiter:
+    def __init__(self, collection, limit, window, block_seconds):
+        self.collection = collection
+        self.limit = limit
+        self.window = window
+        self.block_seconds = block_seconds
+
+    def allow(self, key):
+        now = time.time()
+        index = int(now // self.window)
+        expires_at = datetime.utcfromtimestamp(now + 2 * self.window)
+        try:
+            counter = self.collection.find_one_and_update(
+                {"_id": key},
+                [{"$set": {
+                    "previous": {"$switch": {
+                        "branches": [
+                            {"case": {"$eq": ["$index", index]}, "then": "$previous"},
+                            {"case": {"$eq": ["$index", index - 1]}, "then": "$count"},
+                        ],
+                        "default": 0,
+                    }},
+                    "count": {"$cond": [{"$eq": ["$index", index]}, {"$add": ["$count", 1]}, 1]},
+                    "index": index,
+                    "expires_at": {"$max": ["$blocked_until", expires_at]},
+                }}],
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+            blocked_until = counter.get("blocked_until")
+            if blocked_until and blocked_until > datetime.utcfromtimestamp(now):
+                return False
+
+            overlap = 1 - (now % self.window) / self.window
+            if counter["count"] + counter["previous"] * overlap > self.limit:
+                blocked_until = datetime.utcfromtimestamp(now + self.block_seconds)
+                self.collection.update_one(
+                    {"_id": key},
+                    {"$set": {"blocked_until": blocked_until}, "$max": {"expires_at": blocked_until}},
+                )
+                return False
+            return True
+        except PyMongoError as e:
+            # Fail open: a Mongo hiccup should not take the whole site down.
+            logger.warning(f"Rate limiter unavailable: {e}")
+            return True
 
 
-ip_request_count = {}
-blocked_ip = {}
+def create_rate_limiter(backend):
+    if backend == "mongo":
+        return MongoRateLimiter(rate_limits_collection, RATE_LIMIT_REQUESTS, RATE_LIMIT_WINDOW, RATE_LIMIT_BLOCK_SECONDS)
+    if backend == "memory":
+        return MemoryRateLimiter(RATE_LIMIT_REQUESTS, RATE_LIMIT_WINDOW, RATE_LIMIT_BLOCK_SECONDS)
+    raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {backend}")
 
-def check_blocked_ip(ip):
-    if ip in blocked_ip:
-        if time.time() - blocked_ip[ip] >= 30:
-            del blocked_ip[ip]
-            return False
-        return True
-    return False
+rate_limiter = create_rate_limiter(os.environ.get("RATE_LIMIT_BACKEND", "memory"))
 
-def check_rate_limit(ip):
-    current_time = time.time()
-    if ip not in ip_request_count:
-        ip_request_count[ip] = []
-    
-    checked_requests = []
-    for timestamp in ip_request_count[ip]:
-        if (current_time - timestamp) < 10:
-            checked_requests.append(timestamp)
-    ip_request_count[ip] = checked_requests
-    ip_request_count[ip].append(current_time)
-
-    if len(ip_request_count[ip]) > 50:
-        blocked_ip[ip] = current_time
-        return False
-    return True
+def client_ip():
+    ip = request.headers.get('X-Forwarded-For', request.remote_addr) or ""
+    if ',' in ip:
+        ip = ip.split(',')[0].strip()
+    return ip
 
 @app.before_request
 def check_dos_protection():
-    ip = request.headers.get('X-Forwarded-For', request.remote_addr)
-    if ',' in ip:
-        ip = ip.split(',')[0].strip()
-    print(f"Request from IP: {ip}")
-    if check_blocked_ip(ip):
-        return "Too Many Requests", 429
-    if not check_rate_limit(ip):
+    if not app.config["RATE_LIMIT_ENABLED"]:
+        return
+    if app.config["RATE_LIMIT_SKIP_STATIC"] and request.path.startswith(app.static_url_path + "/"):
+        return
+    if not rate_limiter.allow(client_ip()):
+        RATE_LIMIT_BLOCKS.inc()
         return "Too Many Requests", 429
 
+BCRYPT_LOG_ROUNDS = int(os.environ.get("BCRYPT_LOG_ROUNDS", 12))
+BCRYPT_POOL_SIZE = int(os.environ.get("BCRYPT_POOL_SIZE", os.cpu_count() or 2))
+BCRYPT_QUEUE_LIMIT = int(os.environ.get("BCRYPT_QUEUE_LIMIT", 4 * BCRYPT_POOL_SIZE))
+
+# bcrypt runs in a separate process pool so a login burst cannot hold the GIL
+# that request threads and websocket emits need. At most
+# BCRYPT_POOL_SIZE + BCRYPT_QUEUE_LIMIT hashes may be in flight; beyond that
+# requests get a 503 instead of queueing without bound.
+class PasswordPoolBusy(Exception):
+    pass
+
+def _bcrypt_hash(password, rounds):
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds)).decode("utf-8")
+
+def _bcrypt_check(stored_password, provided_password):
+    return bcrypt.checkpw(provided_password.encode("utf-8"), stored_password.encode("utf-8"))
+
+password_pool = None
+password_pool_lock = threading.Lock()
+password_pool_slots = threading.BoundedSemaphore(BCRYPT_POOL_SIZE + BCRYPT_QUEUE_LIMIT)
+
+def get_password_pool():
+    global password_pool
+    with password_pool_lock:
+        if password_pool is None:
+            # Spawned workers do not inherit monkey-patched or forked state.
+            password_pool = ProcessPoolExecutor(
+                max_workers=BCRYPT_POOL_SIZE,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return password_pool
+
+# The pool's management thread never finishes on its own under eventlet, so
+# a process that has hashed a password would hang at exit (and gunicorn would
+# SIGKILL the worker, orphaning the pool's children) without this.
+def shutdown_password_pool():
+    global password_pool
+    with password_pool_lock:
+        pool, password_pool = password_pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+atexit.register(shutdown_password_pool)
+
+def run_password_task(fn, *args):
+    if BCRYPT_POOL_SIZE <= 0:
+        return fn(*args)
+    if not password_pool_slots.acquire(blocking=False):
+        BCRYPT_REJECTIONS.inc()
+        raise PasswordPoolBusy()
+    BCRYPT_IN_FLIGHT.inc()
+    try:
+        future = get_password_pool().submit(fn, *args)
+        if SERVER_MODE != "threading":
+            # Yield to the event loop instead of blocking every green thread.
+            while not future.done():
+                socketio.sleep(0.005)
+        return future.result()
+    finally:
+        BCRYPT_IN_FLIGHT.dec()
+        password_pool_slots.release()
+
 def hash_password(password):
-    return bcrypt.generate_password_hash(password).decode('utf-8')
+    return run_password_task(_bcrypt_hash, password, BCRYPT_LOG_ROUNDS)
 
 def check_password(stored_password, provided_password):
-    return bcrypt.check_password_hash(stored_password, provided_password)
+    return run_password_task(_bcrypt_check, stored_password, provided_password)
+
+def password_needs_rehash(stored_password):
+    try:
+        return int(stored_password.split("$")[2]) != BCRYPT_LOG_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+@app.errorhandler(PasswordPoolBusy)
+def password_pool_busy(e):
+    response = jsonify({"success": False, "message": "Server is busy, please try again."})
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
+def hash_auth_token(token):
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
 
 def verify_auth_token(token):
     if not token:
         return None
 
-    hashed_token = hashlib.sha256(token.encode("utf-8")).hexdigest()
-    user = users_collection.find_one({"auth_token": hashed_token})
+    hashed_token = hash_auth_token(token)
+    user = session_cache.get(hashed_token)
+    if user:
+        return user
+
+    user = users_collection.find_one({"auth_token": hashed_token}, {"username": 1})
+    if user:
+        session_cache.set(hashed_token, user)
     return user
 
 def validate_session():
@@ -107,8 +651,73 @@ def allowed_file(filename):
     ALLOWED_EXTENSIONS = {"jpg"}
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
+app.config["MAX_CONTENT_LENGTH"] = int(os.environ.get("MAX_CONTENT_LENGTH", 16 * 1024 * 1024))
+app.config["USE_X_SENDFILE"] = os.environ.get("USE_X_SENDFILE") == "1"
+PFP_MAX_BYTES = int(os.environ.get("PFP_MAX_BYTES", 5 * 1024 * 1024))
+PFP_THUMBNAIL_SIZE = 256
+# When set (e.g. "/protected-uploads"), nginx serves uploads via X-Accel-Redirect.
+UPLOAD_ACCEL_PREFIX = os.environ.get("UPLOAD_ACCEL_PREFIX")
+UPLOAD_CHUNK_SIZE = 64 * 1024
+JPEG_MAGIC = b"\xff\xd8\xff"
+# <sha256>.jpg originals and <sha256>_<size>.jpg thumbnails never change.
+HASHED_UPLOAD = re.compile(r"^[0-9a-f]{64}(_\d+)?\.jpg$")
+
+def upload_folder_path():
+    return os.path.join(app.root_path, app.config["UPLOAD_FOLDER"])
+
+@app.errorhandler(RequestEntityTooLarge)
+def upload_too_large(e):
+    return jsonify({'status': 'error', 'message': 'File is too large'}), 413
+
+# Copies the upload to disk in chunks, hashing as it goes, and names it after
+# its content so identical pictures are stored once.
+def save_upload(stream, header):
+    upload_folder = upload_folder_path()
+    digest = hashlib.sha256(header)
+    size = len(header)
+    fd, temp_path = tempfile.mkstemp(dir=upload_folder, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            out.write(header)
+            while True:
+                chunk = stream.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > PFP_MAX_BYTES:
+                    raise RequestEntityTooLarge()
+                digest.update(chunk)
+                out.write(chunk)
+
+        content_hash = digest.hexdigest()
+        os.replace(temp_path, os.path.join(upload_folder, f"{content_hash}.jpg"))
+        return content_hash
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def make_thumbnail(content_hash):
+    upload_folder = upload_folder_path()
+    thumbnail_name = f"{content_hash}_{PFP_THUMBNAIL_SIZE}.jpg"
+    thumbnail_path = os.path.join(upload_folder, thumbnail_name)
+    if not os.path.exists(thumbnail_path):
+        with Image.open(os.path.join(upload_folder, f"{content_hash}.jpg")) as image:
+            image.draft("RGB", (PFP_THUMBNAIL_SIZE, PFP_THUMBNAIL_SIZE))
+            thumbnail = ImageOps.exif_transpose(image).convert("RGB")
+            thumbnail.thumbnail((PFP_THUMBNAIL_SIZE, PFP_THUMBNAIL_SIZE))
+            fd, temp_path = tempfile.mkstemp(dir=upload_folder, suffix=".part")
+            with os.fdopen(fd, "wb") as out:
+                thumbnail.save(out, "JPEG", quality=85, optimize=True)
+            os.replace(temp_path, thumbnail_path)
+    return thumbnail_name
+
 @app.route("/profile/upload", methods=["POST"])
 def upload_pfp():
+    username = validate_session()
+    if not username:
+        return jsonify({'status': 'error', 'message': 'User not authenticated'}), 401
+
     if "file" not in request.files:
         return jsonify({'status': 'error', 'message': 'No file selected'}), 400
 
@@ -118,41 +727,98 @@ def upload_pfp():
     if file.filename == "":
         return jsonify({'status': 'error', 'message': 'No file selected'}), 400
 
-    if file and allowed_file(file.filename):
-        file_extension = file.filename.rsplit('.', 1)[1].lower()
-        random_filename = f"{uuid.uuid4().hex}.{file_extension}"  # Generate a random filename
-        filepath = os.path.join(app.config["UPLOAD_FOLDER"], random_filename)
-        file.save(filepath)
-
-        # Update the user's profile picture in the database
-        username = request.cookies.get("username")
-        if username:
-            users_collection.update_one(
-                {"username": username},
-                {"$set": {"profile_picture": f"/uploads/{random_filename}"}}
-            )
-            return jsonify({'status': 'ok', 'message': 'Profile picture updated successfully!', 'profile_picture': f"/{filepath}"}), 200
+    if not allowed_file(file.filename):
+        return jsonify({'status': 'error', 'message': 'Invalid file format'}), 400
 
-        return jsonify({'status': 'error', 'message': 'User not authenticated'}), 401
+    header = file.stream.read(len(JPEG_MAGIC))
+    if header != JPEG_MAGIC:
+        return jsonify({'status': 'error', 'message': 'Invalid file format'}), 400
 
-    return jsonify({'status': 'error', 'message': 'Invalid file format'}), 400
+    content_hash = save_upload(file.stream, header)
+    try:
+        thumbnail_name = make_thumbnail(content_hash)
+    except (OSError, Image.DecompressionBombError):
+        os.remove(os.path.join(upload_folder_path(), f"{content_hash}.jpg"))
+        return jsonify({'status': 'error', 'message': 'Invalid file format'}), 400
+
+    # Update the user's profile picture in the database
+    profile_picture = f"/uploads/{thumbnail_name}"
+    users_collection.update_one(
+        {"username": username},
+        {"$set": {"profile_picture": profile_picture, "profile_picture_original": f"/uploads/{content_hash}.jpg"}}
+    )
+    return jsonify({'status': 'ok', 'message': 'Profile picture updated successfully!', 'profile_picture': profile_picture}), 200
 
 @app.route('/uploads/<filename>')
 def serve_uploaded_file(filename):
+    # Content-hashed files can be cached forever; anything else (legacy uuid
+    # names, the default picture) gets a short revalidating cache.
+    immutable = bool(HASHED_UPLOAD.match(filename))
+    max_age = 31536000 if immutable else 3600
+    etag = filename.rsplit(".", 1)[0] if immutable else True
+
+    if UPLOAD_ACCEL_PREFIX:
+        if not os.path.isfile(safe_join(upload_folder_path(), filename) or ""):
+            return jsonify({'status': 'error', 'message': 'File not found'}), 404
+        response = make_response("")
+        response.headers["X-Accel-Redirect"] = f"{UPLOAD_ACCEL_PREFIX.rstrip('/')}/{filename}"
+        response.headers["Content-Type"] = "image/jpeg"
+        if immutable:
+            response.set_etag(etag)
+    else:
+        try:
+            response = send_from_directory(
+                upload_folder_path(), filename, mimetype="image/jpeg", conditional=True, etag=etag, max_age=max_age
+            )
+        except NotFound:
+            return jsonify({'status': 'error', 'message': 'File not found'}), 404
+
+    response.headers["Cache-Control"] = f"public, max-age={max_age}" + (", immutable" if immutable else "")
+    response.headers["X-Content-Type-Options"] = "nosniff"
+    return response
+
+
+ASSET_MAX_AGE = 31536000
+
+def load_asset_manifest():
     try:
-        file_path = os.path.join(os.getcwd(), "Frontend/uploads", filename)
-        print("Resolved file path:", file_path)  # Debugging output
-        response = send_file(file_path, mimetype="image/jpg")
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        return response
+        with open(os.path.join(app.static_folder, "dist", "manifest.json")) as f:
+            return json.load(f)
     except FileNotFoundError:
-        return jsonify({'status': 'error', 'message': 'File not found'}), 404
-
+        return {}
+
+# Built by build_assets.py; empty in development, where assets are served
+# from their plain /static/ paths.
+asset_manifest = load_asset_manifest()
+
+@app.template_global()
+def asset_url(filename):
+    return url_for("static", filename=asset_manifest.get(filename, filename))
+
+# Fingerprinted assets never change under the same name, so they are cached
+# for a year and served precompressed when the client accepts it.
+@app.route("/static/dist/<path:filename>")
+def serve_built_asset(filename):
+    dist_folder = os.path.join(app.static_folder, "dist")
+    mimetype = mimetypes.guess_type(filename)[0]
+    response = None
+    for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+        compressed_path = safe_join(dist_folder, filename + suffix)
+        if request.accept_encodings[encoding] > 0 and compressed_path and os.path.isfile(compressed_path):
+            response = send_from_directory(dist_folder, filename + suffix, mimetype=mimetype, conditional=True, max_age=ASSET_MAX_AGE)
+            response.headers["Content-Encoding"] = encoding
+            break
+    if response is None:
+        response = send_from_directory(dist_folder, filename, mimetype=mimetype, conditional=True, max_age=ASSET_MAX_AGE)
+
+    response.headers["Cache-Control"] = f"public, max-age={ASSET_MAX_AGE}, immutable"
+    response.headers["Vary"] = "Accept-Encoding"
+    return response
 
-@app.route("/static/cat.jpg")
-def serve_cat_image():
-    response = send_file("Frontend/static/cat.jpg", mimetype="image/jpeg")
-    response.headers["X-Content-Type-Options"] = "nosniff"
+@app.after_request
+def set_static_headers(response):
+    if request.endpoint in ("static", "serve_built_asset"):
+        response.headers["X-Content-Type-Options"] = "nosniff"
     return response
 
 @app.route("/")
@@ -170,34 +836,96 @@ def chr_filter(value):
     except (ValueError, TypeError):
         return ''
 
-def broadcast_timer():
-    ny_tz = pytz.timezone('America/New_York')
+def broadcast(event, data, **kwargs):
+    SOCKET_EMITS.inc(event=event)
+    socketio.emit(event, data, **kwargs)
+
+def quiz_room(quiz_id):
+    return f"quiz:{quiz_id}"
+
+@socketio.on("joinRoom")
+def join_quiz_room(data):
+    quiz_id = (data or {}).get("quizId")
+    if quiz_id and ObjectId.is_valid(quiz_id):
+        join_room(quiz_room(quiz_id))
+
+@socketio.on("leaveRoom")
+def leave_quiz_room(data):
+    quiz_id = (data or {}).get("quizId")
+    if quiz_id and ObjectId.is_valid(quiz_id):
+        leave_room(quiz_room(quiz_id))
 
+LIKE_FLUSH_INTERVAL = float(os.environ.get("LIKE_FLUSH_INTERVAL", 0.2))
+
+# Latest like count per quiz since the last flush. A like storm on one quiz
+# collapses into a single "like_quiz" event per tick for that quiz's room.
+pending_like_counts = {}
+pending_like_counts_lock = threading.Lock()
+
+def queue_like_update(quiz_id, likes_count):
+    with pending_like_counts_lock:
+        pending_like_counts[quiz_id] = likes_count
+
+def flush_like_updates():
+    with pending_like_counts_lock:
+        updates = dict(pending_like_counts)
+        pending_like_counts.clear()
+    for quiz_id, likes_count in updates.items():
+        broadcast("like_quiz", {"quiz_id": quiz_id, "likes_count": likes_count}, to=quiz_room(quiz_id))
+
+def like_update_loop():
     while True:
-        now = datetime.now(ny_tz)
-        today = now.date()
-        reset_time = ny_tz.localize(datetime.combine(today + timedelta(days=1), datetime.min.time()))
-        time_left = int((reset_time - now).total_seconds())
-        socketio.emit("update_timer", {"time_left": time_left}, to=None)
-        
-        socketio.sleep(1)
+        socketio.sleep(LIKE_FLUSH_INTERVAL)
+        flush_like_updates()
 
-@app.route("/dashboard")
-def dashboard():
-    username = validate_session()
-    if not username:
-        return redirect("/?message=Please log in.")
+POLL_TIMEZONE = pytz.timezone(os.environ.get("POLL_TIMEZONE", "America/New_York"))
+
+# The daily poll and the countdown both roll over at midnight in POLL_TIMEZONE.
+def poll_day(now=None):
+    now = now or datetime.now(POLL_TIMEZONE)
+    return datetime.combine(now.date(), datetime.min.time())
+
+def next_reset_time(now=None):
+    now = now or datetime.now(POLL_TIMEZONE)
+    return POLL_TIMEZONE.localize(datetime.combine(now.date() + timedelta(days=1), datetime.min.time()))
+
+def reset_schedule():
+    now = datetime.now(POLL_TIMEZONE)
+    return {
+        "reset_at": int(next_reset_time(now).timestamp() * 1000),
+        "server_time": int(now.timestamp() * 1000),
+    }
+
+# Clients run the countdown themselves; the server only tells them when the
+# next reset is, on connect and again at each rollover.
+@socketio.on("connect")
+def send_reset_schedule(auth=None):
+    SOCKET_CONNECTIONS.inc()
+    SOCKET_EMITS.inc(event="reset_schedule")
+    emit("reset_schedule", reset_schedule())
 
-    quizzes = list(quizzes_collection.find())
+@socketio.on("disconnect")
+def track_disconnect(*args):
+    SOCKET_CONNECTIONS.dec()
 
-    today = datetime.utcnow().date()
-    today_datetime = datetime.combine(today, datetime.min.time())
-    daily_poll = polls_collection.find_one({"date": today_datetime})
+def poll_rollover_loop():
+    day = poll_day()
+    while True:
+        remaining = (next_reset_time() - datetime.now(POLL_TIMEZONE)).total_seconds()
+        # Wake at least hourly so clock adjustments cannot make us oversleep.
+        socketio.sleep(min(remaining + 0.5, 3600))
+        if poll_day() == day:
+            continue
+        day = poll_day()
 
-    correct_answer = None
+        try:
+            get_daily_poll()
+        except PyMongoError as e:
+            logger.warning(f"Could not create the daily poll: {e}")
+        # Every node sends this at rollover; clients treat repeats as no-ops.
+        broadcast("reset_schedule", reset_schedule())
 
-    if not quizzes:
-        default_quiz = {
+DEFAULT_QUIZ = {
     "title": "Cat Trivia",
     "questions": {
         "What is the most popular cat breed in the world?": {
@@ -243,29 +971,216 @@ def dashboard():
     },
     "created_by": "System",
     "likes": 0,
-    "comments": []
+    "comment_count": 0,
+    "recent_comments": [],
+    "version": 0
+}
+DEFAULT_QUIZ["question_texts"] = list(DEFAULT_QUIZ["questions"])
+
+DASHBOARD_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+COMMENT_PREVIEW_SIZE = 5
+COMMENT_PAGE_SIZE = 20
+
+# Only what a dashboard card renders: the full questions map and the
+# comment history stay in Mongo.
+QUIZ_CARD_PROJECTION = {
+    "title": 1,
+    "created_by": 1,
+    "likes": 1,
+    "comment_count": 1,
+    "recent_comments": 1,
+    "version": 1,
 }
-        quizzes_collection.insert_one(default_quiz)
-        quizzes = [default_quiz] 
 
+FRAGMENT_CACHE_SIZE = int(os.environ.get("FRAGMENT_CACHE_SIZE", 5000))
+
+# Rendered quiz card / quiz detail HTML keyed by (kind, quiz _id, version).
+# Every write that changes what a fragment shows bumps the quiz's version,
+# so stale entries are never hit and simply age out of the LRU.
+fragment_cache = TTLCache(FRAGMENT_CACHE_SIZE, None)
+
+def render_fragment(kind, template, quiz):
+    key = (kind, str(quiz["_id"]), quiz.get("version", 0))
+    html = fragment_cache.get(key)
+    if html is None:
+        html = Markup(render_template(template, quiz=quiz))
+        fragment_cache.set(key, html)
+    return html
+
+def render_quiz_card(quiz):
+    return render_fragment("card", "components/quiz_card.html", quiz)
+
+def fetch_quiz_page(before=None, limit=DASHBOARD_PAGE_SIZE):
+    query = {}
+    if before:
+        query["_id"] = {"$lt": before}
+
+    quizzes = list(
+        quizzes_collection.find(query, QUIZ_CARD_PROJECTION)
+        .sort("_id", -1)
+        .limit(limit + 1)
+    )
+    next_cursor = None
+    if len(quizzes) > limit:
+        quizzes = quizzes[:limit]
+        next_cursor = str(quizzes[-1]["_id"])
+    return quizzes, next_cursor
+
+SEARCH_SORTS = ("relevance", "newest", "likes")
+MAX_SEARCH_OFFSET = 1000
+
+# Search results page by page. "newest" and "likes" use keyset cursors
+# (_id, or likes:_id) backed by the (_id) and (likes, _id) indexes;
+# "relevance" orders by text score, which has no stable key to seek from,
+# so its cursor is a skip offset capped at MAX_SEARCH_OFFSET.
+def search_quizzes(text=None, creator=None, sort="relevance", cursor=None, limit=DASHBOARD_PAGE_SIZE):
+    query = {}
+    projection = dict(QUIZ_CARD_PROJECTION)
+    if text:
+        # Stored titles and questions are HTML-escaped, so escape the terms the same way.
+        query["$text"] = {"$search": escape(text)}
+    if creator:
+        query["created_by"] = creator
+    if sort == "relevance" and not text:
+        sort = "newest"
+
+    offset = 0
+    if sort == "relevance":
+        projection["score"] = {"$meta": "textScore"}
+        order = [("score", {"$meta": "textScore"}), ("_id", DESCENDING)]
+        offset = int(cursor) if cursor else 0
+        if not 0 <= offset <= MAX_SEARCH_OFFSET:
+            raise ValueError("Cursor out of range.")
+    elif sort == "likes":
+        order = [("likes", DESCENDING), ("_id", DESCENDING)]
+        if cursor:
+            likes, before = cursor.split(":", 1)
+            likes, before = int(likes), ObjectId(before)
+            query["$or"] = [{"likes": {"$lt": likes}}, {"likes": likes, "_id": {"$lt": before}}]
+    else:
+        order = [("_id", DESCENDING)]
+        if cursor:
+            query["_id"] = {"$lt": ObjectId(cursor)}
+
+    quizzes = list(quizzes_collection.find(query, projection).sort(order).skip(offset).limit(limit + 1))
+    next_cursor = None
+    if len(quizzes) > limit:
+        quizzes = quizzes[:limit]
+        last = quizzes[-1]
+        if sort == "relevance":
+            next_cursor = str(offset + limit) if offset + limit <= MAX_SEARCH_OFFSET else None
+        elif sort == "likes":
+            next_cursor = f"{last.get('likes', 0)}:{last['_id']}"
+        else:
+            next_cursor = str(last["_id"])
+    return quizzes, next_cursor
+
+def pick_random_quiz():
+    sampled = list(quizzes_collection.aggregate([{"$sample": {"size": 1}}]))
+    if sampled:
+        return sampled[0]
+
+    default_quiz = dict(DEFAULT_QUIZ)
+    quizzes_collection.insert_one(default_quiz)
+    return default_quiz
+
+POLL_RESULTS_TTL = float(os.environ.get("POLL_RESULTS_TTL", 2.0))
+
+# Today's poll, its correct answer and a recent results snapshot. Everything
+# but the results is fixed for the day, so it is loaded once per process per
+# day; results are re-read at most every POLL_RESULTS_TTL seconds.
+daily_poll_cache = {}
+daily_poll_lock = threading.Lock()
+
+def load_daily_poll(day):
+    daily_poll = polls_collection.find_one({"date": day})
     if not daily_poll:
-        random_quiz = choice(quizzes)
+        random_quiz = pick_random_quiz()
         question_text = choice(list(random_quiz["questions"].keys()))
         choices = random_quiz["questions"][question_text]["choices"]
 
-        daily_poll = {
+        new_poll = {
             "question": question_text,
             "choices": choices,
             "quiz_id": random_quiz["_id"],
-            "results": {choices[i].strip(): 0 for i in range(len(choices)) if choices[i].strip()},
-            "date": today_datetime
+            "results": {result_key(choices[i].strip()): 0 for i in range(len(choices)) if choices[i].strip()},
+            "date": day
         }
-        polls_collection.insert_one(daily_poll)
+        # The unique index on date lets exactly one concurrent creator win;
+        # everyone else gets the winner's poll back.
+        try:
+            daily_poll = polls_collection.find_one_and_update(
+                {"date": day},
+                {"$setOnInsert": new_poll},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            daily_poll = polls_collection.find_one({"date": day})
+
+    return daily_poll, poll_correct_answer(daily_poll)
+
+def poll_correct_answer(poll):
+    quiz = quizzes_collection.find_one({"_id": poll["quiz_id"]}, {"questions": 1})
+    if quiz and poll["question"] in quiz["questions"]:
+        return quiz["questions"][poll["question"]]["correct_answer"]
+    return None
+
+def get_daily_poll():
+    day = poll_day()
+    with daily_poll_lock:
+        if daily_poll_cache.get("day") == day:
+            return daily_poll_cache["poll"], daily_poll_cache["correct_answer"]
+
+    daily_poll, correct_answer = load_daily_poll(day)
+    with daily_poll_lock:
+        daily_poll_cache.update(
+            day=day,
+            poll=daily_poll,
+            correct_answer=correct_answer,
+            results=decode_results(daily_poll.get("results", {})),
+            results_at=time.monotonic(),
+        )
+    return daily_poll, correct_answer
+
+# Poll results are a map of answer -> votes, but Mongo field names can't
+# contain "." or start with "$" (an answer like "3.5" would $inc a nested
+# field). Answers are stored under these keys and decoded when read.
+def result_key(answer):
+    key = answer.replace(".", "\uff0e")
+    return "\uff04" + key[1:] if key.startswith("$") else key
+
+def decode_results(results):
+    return {
+        ("$" + key[1:] if key.startswith("\uff04") else key).replace("\uff0e", "."): count
+        for key, count in results.items()
+    }
 
-    if daily_poll:
-        quiz = quizzes_collection.find_one({"_id": daily_poll["quiz_id"]})
-        if quiz and daily_poll["question"] in quiz["questions"]:
-            correct_answer = quiz["questions"][daily_poll["question"]]["correct_answer"]
+def cache_poll_results(poll_id, results):
+    with daily_poll_lock:
+        if daily_poll_cache.get("poll") and daily_poll_cache["poll"]["_id"] == poll_id:
+            daily_poll_cache["results"] = results
+            daily_poll_cache["results_at"] = time.monotonic()
+
+def get_poll_results(poll_id):
+    with daily_poll_lock:
+        if (daily_poll_cache.get("poll") and daily_poll_cache["poll"]["_id"] == poll_id
+                and time.monotonic() - daily_poll_cache["results_at"] < POLL_RESULTS_TTL):
+            return dict(daily_poll_cache["results"])
+
+    poll = polls_collection.find_one({"_id": poll_id}, {"results": 1})
+    results = decode_results(poll.get("results", {})) if poll else {}
+    cache_poll_results(poll_id, results)
+    return dict(results)
+
+@app.route("/dashboard")
+def dashboard():
+    username = validate_session()
+    if not username:
+        return redirect("/?message=Please log in.")
+
+    daily_poll, correct_answer = get_daily_poll()
 
     user_vote = None
     if daily_poll:
@@ -275,17 +1190,149 @@ def dashboard():
             "type": "vote"
         })
 
+    poll_results = None
+    if user_vote:
+        # Include this process's buffered votes so a voter sees their own vote
+        # before the next flush.
+        poll_results = get_poll_results(daily_poll["_id"])
+        for answer, count in pending_vote_counts(daily_poll["_id"]).items():
+            poll_results[answer] = poll_results.get(answer, 0) + count
+        # The vote may sit in another worker's buffer, or in a flush that
+        # hasn't landed yet; the voter should still see it counted.
+        if not poll_results.get(user_vote["answer"]):
+            poll_results[user_vote["answer"]] = 1
+
+    quizzes, next_cursor = fetch_quiz_page()
+
     return render_template(
         "dashboard.html",
         username=username,
-        quizzes=quizzes,
+        leaders=get_leaderboard(),
+        user_stats=get_user_stats(username),
+        quiz_cards=[render_quiz_card(quiz) for quiz in quizzes],
+        next_cursor=next_cursor,
         daily_poll=daily_poll,
-        poll_results=daily_poll["results"] if user_vote else None,
+        poll_results=poll_results,
         correct_answer=correct_answer,
         user_vote=user_vote,
-        is_not_logged_in=True if validate_session() else False
+        is_not_logged_in=True
+    )
+
+@app.route("/dashboard/quizzes", methods=["GET"])
+def dashboard_quizzes():
+    username = validate_session()
+    if not username:
+        return jsonify({"success": False, "message": "User not authenticated."}), 401
+
+    before = request.args.get("before")
+    try:
+        before = ObjectId(before) if before else None
+    except Exception:
+        return jsonify({"success": False, "message": "Invalid cursor."}), 400
+
+    limit = request.args.get("limit", DASHBOARD_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    quizzes, next_cursor = fetch_quiz_page(before, limit)
+    html = "".join(render_quiz_card(quiz) for quiz in quizzes)
+
+    return jsonify({
+        "success": True,
+        "quizzes": [serialize_quiz_card(quiz) for quiz in quizzes],
+        "html": html,
+        "next_cursor": next_cursor,
+    })
+
+def search_args():
+    sort = request.args.get("sort", "relevance")
+    return {
+        "text": request.args.get("q", "").strip(),
+        "creator": request.args.get("creator", "").strip(),
+        "sort": sort if sort in SEARCH_SORTS else "relevance",
+    }
+
+@app.route("/search", methods=["GET"])
+def search():
+    username = validate_session()
+    if not username:
+        return redirect("/?message=Please log in.")
+
+    args = search_args()
+    try:
+        quizzes, next_cursor = search_quizzes(**args)
+    except PyMongoError:
+        quizzes, next_cursor = [], None  # e.g. a query made only of stop words
+    return render_template(
+        "search.html",
+        quiz_cards=[render_quiz_card(quiz) for quiz in quizzes],
+        next_cursor=next_cursor,
+        sorts=SEARCH_SORTS,
+        is_not_logged_in=True,
+        **args
     )
 
+@app.route("/search/results", methods=["GET"])
+def search_results():
+    username = validate_session()
+    if not username:
+        return jsonify({"success": False, "message": "User not authenticated."}), 401
+
+    limit = request.args.get("limit", DASHBOARD_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    try:
+        quizzes, next_cursor = search_quizzes(cursor=request.args.get("cursor"), limit=limit, **search_args())
+    except (ValueError, InvalidId, PyMongoError):
+        return jsonify({"success": False, "message": "Invalid cursor."}), 400
+
+    return jsonify({
+        "success": True,
+        "quizzes": [serialize_quiz_card(quiz) for quiz in quizzes],
+        "html": "".join(render_quiz_card(quiz) for quiz in quizzes),
+        "next_cursor": next_cursor,
+    })
+
+def serialize_quiz_card(quiz):
+    return {
+        "_id": str(quiz["_id"]),
+        "title": quiz.get("title"),
+        "created_by": quiz.get("created_by"),
+        "likes": quiz.get("likes", 0),
+        "comment_count": quiz.get("comment_count", 0),
+        "recent_comments": [serialize_comment(c) for c in quiz.get("recent_comments", [])],
+    }
+
+def serialize_comment(comment):
+    return {"_id": str(comment["_id"]), "username": comment["username"], "text": comment["text"]}
+
+@app.route("/comments/<quiz_id>", methods=["GET"])
+def list_comments(quiz_id):
+    try:
+        quiz_object_id = ObjectId(quiz_id)
+        before = request.args.get("before")
+        before = ObjectId(before) if before else None
+    except Exception:
+        return jsonify({"success": False, "message": "Invalid quiz ID or cursor."}), 400
+
+    limit = request.args.get("limit", COMMENT_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    query = {"quiz_id": quiz_object_id}
+    if before:
+        query["_id"] = {"$lt": before}
+    comments = list(comments_collection.find(query).sort("_id", -1).limit(limit + 1))
+
+    next_cursor = None
+    if len(comments) > limit:
+        comments = comments[:limit]
+        next_cursor = str(comments[-1]["_id"])
+
+    return jsonify({
+        "success": True,
+        "comments": [serialize_comment(c) for c in reversed(comments)],
+        "next_cursor": next_cursor,
+    })
+
 
 
 @app.route("/register_user", methods=["POST"])
@@ -312,8 +1359,16 @@ def login():
     if not user or not check_password(user["password"], password):
         return jsonify({"success": False, "message": "Invalid credentials."}), 401
 
+    if password_needs_rehash(user["password"]):
+        try:
+            users_collection.update_one({"_id": user["_id"]}, {"$set": {"password": hash_password(password)}})
+        except PasswordPoolBusy:
+            pass  # Try again on a later login.
+
     raw_token = user["username"] + request.remote_addr
-    auth_token = hashlib.sha256(raw_token.encode()).hexdigest()
+    auth_token = hash_auth_token(raw_token)
+    if user.get("auth_token"):
+        session_cache.delete(user["auth_token"])
     users_collection.update_one({"username": user["username"]}, {"$set": {"auth_token": auth_token}})
 
     response = make_response(redirect("/dashboard"))
@@ -328,6 +1383,7 @@ def logout():
     user = verify_auth_token(auth_token)
 
     if user:
+        session_cache.delete(hash_auth_token(auth_token))
         users_collection.update_one({"username": username}, {"$unset": {"auth_token": ""}})
 
     response = make_response(redirect("/"))
@@ -341,29 +1397,144 @@ def upload_quiz():
     if not username:
         return redirect("/?message=Please log in.")
 
-    title = escape(request.form.get("title"))
-    questions = [escape(q) for q in request.form.getlist("questions[]")]
-    answers = [escape(a) for a in request.form.getlist("answers[]")]
-    correct_answers = [escape(ca) for ca in request.form.getlist("correct_answers[]")]
+    title = request.form.get("title")
+    questions = request.form.getlist("questions[]")
+    answers = request.form.getlist("answers[]")
+    correct_answers = request.form.getlist("correct_answers[]")
 
     if len(questions) != len(answers) or len(questions) != len(correct_answers):
         return jsonify({"success": False, "message": "All fields must have the same number of entries."}), 400
 
-    quiz = {
-        "title": title,
+    quiz = build_quiz(
+        title,
+        [(questions[i], answers[i].split(','), correct_answers[i]) for i in range(len(questions))],
+        username,
+    )
+    quizzes_collection.insert_one(quiz)
+    return redirect("/dashboard")
+
+# The quiz document every creation path stores. questions is a list of
+# (question, choices, correct answer) in raw user text.
+def build_quiz(title, questions, created_by):
+    return {
+        "title": escape(title),
         "questions": {
-            questions[i]: {
-                "correct_answer": correct_answers[i].strip(),
-                "choices": [choice.strip() for choice in answers[i].split(',')]
+            escape(question): {
+                "correct_answer": escape(correct_answer).strip(),
+                "choices": [escape(choice).strip() for choice in choices]
             }
-            for i in range(len(questions))
+            for question, choices, correct_answer in questions
         },
-        "created_by": username,
+        # questions is keyed by question text, which a text index can't see.
+        "question_texts": [escape(question) for question, _, _ in questions],
+        "created_by": created_by,
         "likes": 0,
-        "comments": []
+        "comment_count": 0,
+        "recent_comments": [],
+        "version": 0
     }
-    quizzes_collection.insert_one(quiz)
-    return redirect("/dashboard")
+
+# NDJSON records use the export format:
+#   {"title": "...", "questions": {"<question>": {"choices": [...], "correct_answer": "..."}}}
+def parse_quiz_record(record, created_by):
+    if not isinstance(record, dict):
+        raise ValueError("Record must be a JSON object.")
+    title = record.get("title")
+    if not isinstance(title, str) or not title.strip():
+        raise ValueError("title must be a non-empty string.")
+    questions = record.get("questions")
+    if not isinstance(questions, dict) or not questions:
+        raise ValueError("questions must be a non-empty object.")
+
+    parsed_questions = []
+    for question, details in questions.items():
+        if not isinstance(details, dict):
+            raise ValueError(f"Question {question!r} must be an object.")
+        choices = details.get("choices")
+        correct_answer = details.get("correct_answer")
+        if not isinstance(choices, list) or not choices or not all(isinstance(c, str) for c in choices):
+            raise ValueError(f"Question {question!r} needs a non-empty list of string choices.")
+        if not isinstance(correct_answer, str):
+            raise ValueError(f"Question {question!r} needs a string correct_answer.")
+        parsed_questions.append((question, choices, correct_answer))
+    return build_quiz(title, parsed_questions, created_by)
+
+IMPORT_BATCH_SIZE = 500
+IMPORT_MAX_REPORTED_ERRORS = 1000
+
+@app.route("/quizzes/import", methods=["POST"])
+def import_quizzes():
+    username = validate_session()
+    if not username:
+        return jsonify({"success": False, "message": "User not authenticated."}), 401
+
+    inserted = 0
+    error_count = 0
+    errors = []
+    batch = []  # (line number, quiz)
+
+    def report(line_number, message):
+        nonlocal error_count
+        error_count += 1
+        if len(errors) < IMPORT_MAX_REPORTED_ERRORS:
+            errors.append({"line": line_number, "message": message})
+
+    def flush():
+        nonlocal inserted
+        try:
+            inserted += len(quizzes_collection.insert_many([quiz for _, quiz in batch], ordered=False).inserted_ids)
+        except BulkWriteError as e:
+            inserted += e.details.get("nInserted", 0)
+            for write_error in e.details.get("writeErrors", []):
+                report(batch[write_error["index"]][0], write_error.get("errmsg", "Insert failed."))
+        batch.clear()
+
+    # Read the body line by line so memory use is bounded by one batch.
+    for line_number, line in enumerate(request.stream, start=1):
+        try:
+            line = line.decode("utf-8").strip()
+            if not line:
+                continue
+            batch.append((line_number, parse_quiz_record(json.loads(line), username)))
+        except (UnicodeDecodeError, ValueError) as e:
+            report(line_number, str(e))
+            continue
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            flush()
+    if batch:
+        flush()
+
+    return jsonify({"success": error_count == 0, "inserted": inserted, "error_count": error_count, "errors": errors})
+
+def export_quiz_record(quiz):
+    return {
+        "title": unescape(quiz.get("title", "")),
+        "questions": {
+            unescape(question): {
+                "choices": [unescape(c) for c in details.get("choices", [])],
+                "correct_answer": unescape(details.get("correct_answer", "")),
+            }
+            for question, details in quiz.get("questions", {}).items()
+        },
+        "created_by": quiz.get("created_by"),
+    }
+
+@app.route("/quizzes/export", methods=["GET"])
+def export_quizzes():
+    username = validate_session()
+    if not username:
+        return jsonify({"success": False, "message": "User not authenticated."}), 401
+
+    def generate():
+        cursor = quizzes_collection.find({}, {"title": 1, "questions": 1, "created_by": 1}).sort("_id", 1).batch_size(IMPORT_BATCH_SIZE)
+        for quiz in cursor:
+            yield json.dumps(export_quiz_record(quiz)) + "\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="application/x-ndjson",
+        headers={"Content-Disposition": "attachment; filename=quizzes.ndjson"},
+    )
 
 @app.route("/comment_quiz/<quiz_id>", methods=["POST"])
 def comment_quiz(quiz_id):
@@ -372,13 +1543,26 @@ def comment_quiz(quiz_id):
         return jsonify({"success": False, "message": "User not authenticated."}), 401
 
     comment_text = escape(request.form.get("comment"))
-    quiz_object_id = ObjectId(quiz_id)
-    comment = {"username": username, "text": comment_text}
-    quizzes_collection.update_one({"_id": quiz_object_id}, {"$push": {"comments": comment}})
+    try:
+        quiz_object_id = ObjectId(quiz_id)
+    except Exception:
+        return jsonify({"success": False, "message": "Invalid quiz ID."}), 400
 
-    # Emit the comment globally
-    socketio.emit("new_comment", {"quiz_id": quiz_id, "username": username, "text": comment_text})
-    return jsonify({"success": True, "comment": comment})
+    comment = {"_id": ObjectId(), "username": username, "text": comment_text}
+    comments_collection.insert_one(dict(comment, quiz_id=quiz_object_id))
+    result = quizzes_collection.update_one(
+        {"_id": quiz_object_id},
+        {
+            "$inc": {"comment_count": 1, "version": 1},
+            "$push": {"recent_comments": {"$each": [comment], "$slice": -COMMENT_PREVIEW_SIZE}},
+        },
+    )
+    if not result.matched_count:
+        comments_collection.delete_one({"_id": comment["_id"]})
+        return jsonify({"success": False, "message": "Quiz not found."}), 404
+
+    broadcast("new_comment", {"quiz_id": quiz_id, "username": username, "text": comment_text}, to=quiz_room(quiz_id))
+    return jsonify({"success": True, "comment": serialize_comment(comment)})
 
 @app.route("/interact", methods=["POST"])
 def interact():
@@ -395,72 +1579,178 @@ def interact():
         return jsonify({"success": False, "message": "Invalid quiz ID."}), 400
 
     if interaction_type == "like":
+        like = {"quiz_id": quiz_object_id, "username": username, "type": "like"}
         try:
-            existing_like = interactions_collection.find_one(
-                {"quiz_id": quiz_object_id, "username": username, "type": "like"}
-            )
-            action = ""
-            if existing_like:
-                interactions_collection.delete_one(
-                    {"quiz_id": quiz_object_id, "username": username, "type": "like"}
-                )
-                quizzes_collection.update_one(
-                    {"_id": quiz_object_id},
-                    {"$inc": {"likes": -1}, "$pull": {"likes_users": username}}
-                )
-                action = "unliked"
-            else:
-                interactions_collection.insert_one(
-                    {"quiz_id": quiz_object_id, "username": username, "type": "like"}
-                )
-                quizzes_collection.update_one(
-                    {"_id": quiz_object_id},
-                    {"$inc": {"likes": 1}, "$addToSet": {"likes_users": username}}
-                )
+            # The unique (quiz_id, username, type) index makes the insert the
+            # toggle: it either records a new like or tells us one exists.
+            try:
+                interactions_collection.insert_one(dict(like))
                 action = "liked"
-
-            updated_quiz = quizzes_collection.find_one(
-                {"_id": quiz_object_id}, {"likes": 1, "likes_users": 1}
+                update = {"$inc": {"likes": 1, "version": 1}}
+            except DuplicateKeyError:
+                action = "unliked"
+                if interactions_collection.delete_one(like).deleted_count:
+                    update = {"$inc": {"likes": -1, "version": 1}}
+                else:
+                    # A concurrent request already removed this like.
+                    update = {"$inc": {"likes": 0}}
+
+            updated_quiz = quizzes_collection.find_one_and_update(
+                {"_id": quiz_object_id},
+                update,
+                projection={"likes": 1},
+                return_document=ReturnDocument.AFTER,
             )
             if not updated_quiz:
+                if action == "liked":
+                    interactions_collection.delete_one(like)
                 return jsonify({"success": False, "message": "Quiz not found."}), 404
 
             likes_count = updated_quiz.get("likes", 0)
-            likes_users = updated_quiz.get("likes_users", [])
-
-            socketio.emit("like_quiz", {
-                "quiz_id": quiz_id,
-                "likes_count": likes_count,
-                "likes_users": likes_users,
-                "action": action,
-            })
+            queue_like_update(str(quiz_object_id), likes_count)
 
-            return jsonify({"success": True, "action": action, "likes_count": likes_count, "likes_users": likes_users})
+            return jsonify({"success": True, "action": action, "likes_count": likes_count})
 
         except Exception as e:
-            print(f"Error processing like/unlike: {e}")
+            logger.exception(f"Error processing like/unlike: {e}")
             return jsonify({"success": False, "message": "Failed to process like/unlike."}), 500
 
     return jsonify({"success": False, "message": "Invalid interaction type."}), 400
 
+# Deletes all but the oldest interaction of each (key_fields) group, e.g.
+# likes left behind by racing double-clicks before the unique index existed.
+def dedupe_interactions(interaction_type, key_fields):
+    duplicates = interactions_collection.aggregate([
+        {"$match": {"type": interaction_type}},
+        {"$sort": {"_id": 1}},
+        {"$group": {"_id": {field: f"${field}" for field in key_fields}, "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ], allowDiskUse=True)
+    removed = 0
+    for group in duplicates:
+        removed += interactions_collection.delete_many({"_id": {"$in": group["ids"][1:]}}).deleted_count
+    return removed
+
+# Rebuilds quizzes.likes from the like interactions, which are the source of
+# truth, and drops the likes_users arrays older code kept on quizzes. Likes
+# made while this runs may need another pass.
+def reconcile_likes(batch_size=500):
+    dedupe_interactions("like", ["quiz_id", "username"])
+    like_groups = interactions_collection.aggregate([
+        {"$match": {"type": "like"}},
+        {"$group": {"_id": "$quiz_id", "likes": {"$sum": 1}}},
+    ], allowDiskUse=True)
+
+    liked_quiz_ids = []
+    operations = []
+    for group in like_groups:
+        liked_quiz_ids.append(group["_id"])
+        operations.append(UpdateOne(
+            {"_id": group["_id"]},
+            {"$set": {"likes": group["likes"]}, "$unset": {"likes_users": ""}, "$inc": {"version": 1}},
+        ))
+        if len(operations) >= batch_size:
+            quizzes_collection.bulk_write(operations, ordered=False)
+            operations = []
+    if operations:
+        quizzes_collection.bulk_write(operations, ordered=False)
+
+    quizzes_collection.update_many(
+        {"_id": {"$nin": liked_quiz_ids}, "$or": [{"likes": {"$ne": 0}}, {"likes_users": {"$exists": True}}]},
+        {"$set": {"likes": 0}, "$unset": {"likes_users": ""}, "$inc": {"version": 1}},
+    )
+    return len(liked_quiz_ids)
+
+@app.cli.command("reconcile-likes")
+def reconcile_likes_command():
+    print(f"Reconciled likes for {reconcile_likes()} quizzes.")
+
+# Moves comments embedded in quiz documents into the comments collection.
+# Run it before serving traffic with the new code: migrated comments get fresh
+# _ids, so they would sort after any comment already posted to the collection.
+def migrate_comments():
+    migrated = 0
+    for quiz in quizzes_collection.find({"comments": {"$exists": True}}, {"comments": 1}):
+        comments = [
+            {"_id": ObjectId(), "quiz_id": quiz["_id"], "username": c.get("username"), "text": c.get("text")}
+            for c in quiz.get("comments") or []
+        ]
+        if comments:
+            comments_collection.insert_many(comments, ordered=True)
+
+        recent = list(
+            comments_collection.find({"quiz_id": quiz["_id"]}, {"username": 1, "text": 1})
+            .sort("_id", -1)
+            .limit(COMMENT_PREVIEW_SIZE)
+        )
+        quizzes_collection.update_one(
+            {"_id": quiz["_id"]},
+            {
+                "$set": {
+                    "comment_count": comments_collection.count_documents({"quiz_id": quiz["_id"]}),
+                    "recent_comments": list(reversed(recent)),
+                },
+                "$unset": {"comments": ""},
+                "$inc": {"version": 1},
+            },
+        )
+        migrated += 1
+    return migrated
+
+@app.cli.command("migrate-comments")
+def migrate_comments_command():
+    print(f"Migrated comments for {migrate_comments()} quizzes.")
+
+# Fills question_texts, which the search index reads, on quizzes created
+# before it existed.
+def backfill_search(batch_size=500):
+    updated = 0
+    operations = []
+    for quiz in quizzes_collection.find({"question_texts": {"$exists": False}}, {"questions": 1}):
+        operations.append(UpdateOne(
+            {"_id": quiz["_id"]},
+            {"$set": {"question_texts": list(quiz.get("questions") or {})}},
+        ))
+        if len(operations) >= batch_size:
+            updated += quizzes_collection.bulk_write(operations, ordered=False).modified_count
+            operations = []
+    if operations:
+        updated += quizzes_collection.bulk_write(operations, ordered=False).modified_count
+    return updated
+
+@app.cli.command("backfill-search")
+def backfill_search_command():
+    print(f"Indexed question text for {backfill_search()} quizzes.")
+
 @app.route("/likes/<quiz_id>", methods=["GET"])
 def get_likes(quiz_id):
-    quiz_object_id = ObjectId(quiz_id)
-    quiz = quizzes_collection.find_one({"_id": quiz_object_id}, {"likes_users": 1})
-    if not quiz:
+    try:
+        quiz_object_id = ObjectId(quiz_id)
+    except Exception:
+        return jsonify({"success": False, "message": "Invalid quiz ID."}), 400
+
+    if not quizzes_collection.find_one({"_id": quiz_object_id}, {"_id": 1}):
         return jsonify({"success": False, "message": "Quiz not found"}), 404
 
-    likes_users = quiz.get("likes_users", [])
-    return jsonify({"success": True, "likes_users": likes_users})
+    # Read from the like interactions, which the toggle keeps exact; the
+    # (quiz_id, username, type) index serves this query and its order.
+    likes = interactions_collection.find({"quiz_id": quiz_object_id, "type": "like"}, {"_id": 0, "username": 1}).sort("username", 1)
+    return jsonify({"success": True, "likes_users": [like["username"] for like in likes]})
 
 @app.route("/quiz/<quiz_id>")
 def quiz_details(quiz_id):
     #testing
     try:
-        quiz = quizzes_collection.find_one({"_id": ObjectId(quiz_id)})
+        quiz = quizzes_collection.find_one({"_id": ObjectId(quiz_id)}, {"title": 1, "version": 1})
         if not quiz:
             return "Invalid credentials", 401
-        return render_template('quizPage.html', quiz=quiz, is_not_logged_in=True if validate_session() else False)
+
+        key = ("quiz", str(quiz["_id"]), quiz.get("version", 0))
+        quiz_body = fragment_cache.get(key)
+        if quiz_body is None:
+            quiz["questions"] = (quizzes_collection.find_one({"_id": quiz["_id"]}, {"questions": 1}) or {}).get("questions", {})
+            quiz_body = render_fragment("quiz", "components/quiz_detail.html", quiz)
+        return render_template('quizPage.html', quiz=quiz, quiz_body=quiz_body, is_not_logged_in=True if validate_session() else False)
     except Exception as e:
         # Handle any exceptions (e.g., invalid ObjectId format)
         return str(e), 400
@@ -484,35 +1774,312 @@ def submit_poll():
     except Exception:
         return jsonify({"success": False, "message": "Invalid poll ID."}), 400
 
-    poll = polls_collection.find_one({"_id": poll_object_id})
-    if not poll:
-        return jsonify({"success": False, "message": "Poll not found."}), 404
+    # Only today's poll takes votes: past polls' answers are public, so late
+    # votes would let anyone fill in missed days on the leaderboard.
+    poll, correct_answer = get_daily_poll()
+    if poll["_id"] != poll_object_id:
+        return jsonify({"success": False, "message": "This poll is closed."}), 403
 
-    existing_vote = interactions_collection.find_one({
-        "poll_id": poll_object_id,
-        "username": username,
-        "type": "vote"
-    })
+    answer = str(selected_answer).strip()
+    if not answer or answer not in [c.strip() for c in poll["choices"]]:
+        return jsonify({"success": False, "message": "Invalid answer."}), 400
 
-    if existing_vote:
+    correct = correct_answer is not None and answer == correct_answer.strip()
+    try:
+        interactions_collection.insert_one({
+            "poll_id": poll_object_id,
+            "username": username,
+            "type": "vote",
+            "answer": answer,
+            "correct": correct
+        })
+    except DuplicateKeyError:
         return jsonify({"success": False, "message": "User already voted in this poll."}), 403
 
-    interactions_collection.insert_one({
-        "poll_id": poll_object_id,
-        "username": username,
-        "type": "vote",
-        "answer": selected_answer
-    })
-
-    update_key = f"results.{selected_answer}"
-    polls_collection.update_one({"_id": poll_object_id}, {"$inc": {update_key: 1}})
-
-    updated_poll = polls_collection.find_one({"_id": poll_object_id})
-    if not updated_poll:
-        return jsonify({"success": False, "message": "Poll update failed."}), 500
-
-    return jsonify({"success": True})
+    queue_vote(poll_object_id, answer)
+    try:
+        record_poll_answer(username, poll["date"], correct)
+    except PyMongoError as e:
+        # The vote is saved; `flask rebuild-leaderboard` will count it.
+        logger.warning(f"Could not update stats for {username}: {e}")
+    return jsonify({"success": True, "correct": correct})
+
+VOTE_FLUSH_INTERVAL = float(os.environ.get("VOTE_FLUSH_INTERVAL", 1.0))
+
+# Write-behind poll tallies: poll _id -> {answer: votes not yet in Mongo}.
+# The vote interactions are written synchronously and stay the source of
+# truth, so `flask reconcile-polls` can rebuild results if a process dies with
+# increments still buffered.
+pending_votes = {}
+pending_votes_lock = threading.Lock()
+
+def queue_vote(poll_id, answer):
+    with pending_votes_lock:
+        counts = pending_votes.setdefault(poll_id, {})
+        counts[answer] = counts.get(answer, 0) + 1
+
+def pending_vote_counts(poll_id):
+    with pending_votes_lock:
+        return dict(pending_votes.get(poll_id, {}))
+
+def poll_room(poll_id):
+    return f"poll:{poll_id}"
+
+@socketio.on("joinPoll")
+def join_poll_room(data):
+    poll_id = (data or {}).get("pollId")
+    if poll_id and ObjectId.is_valid(poll_id):
+        join_room(poll_room(poll_id))
+
+def flush_votes():
+    with pending_votes_lock:
+        batch = dict(pending_votes)
+        pending_votes.clear()
+    if not batch:
+        return
+
+    polls = list(batch.items())
+    operations = [
+        UpdateOne({"_id": poll_id}, {"$inc": {f"results.{result_key(answer)}": count for answer, count in counts.items()}})
+        for poll_id, counts in polls
+    ]
+    try:
+        polls_collection.bulk_write(operations, ordered=False)
+    except BulkWriteError as e:
+        # Unordered, so every update without a write error was applied; only
+        # the failed ones go back in the buffer.
+        failed = [polls[error["index"]] for error in e.details.get("writeErrors", [])]
+        failed_ids = {poll_id for poll_id, _ in failed}
+        logger.warning(f"Could not flush votes for {len(failed)} polls, retrying next tick: {e.details.get('writeErrors')}")
+        with pending_votes_lock:
+            for poll_id, counts in failed:
+                pending = pending_votes.setdefault(poll_id, {})
+                for answer, count in counts.items():
+                    pending[answer] = pending.get(answer, 0) + count
+        batch = {poll_id: counts for poll_id, counts in polls if poll_id not in failed_ids}
+    except PyMongoError as e:
+        # The writes may have been applied (e.g. a timeout after the server
+        # ran them), so retrying could count votes twice. The vote
+        # interactions are intact; `flask reconcile-polls` rebuilds results.
+        logger.warning(f"Could not flush poll votes, run reconcile-polls to repair results: {e}")
+        return
+
+    # One results snapshot per poll per flush keeps live updates rate-bounded.
+    for poll in polls_collection.find({"_id": {"$in": list(batch)}}, {"results": 1}):
+        results = decode_results(poll.get("results", {}))
+        cache_poll_results(poll["_id"], results)
+        broadcast("poll_results", {"poll_id": str(poll["_id"]), "results": results}, to=poll_room(poll["_id"]))
+
+def vote_flush_loop():
+    while True:
+        socketio.sleep(VOTE_FLUSH_INTERVAL)
+        try:
+            flush_votes()
+        except PyMongoError as e:
+            logger.warning(f"Could not publish poll results: {e}")
+
+atexit.register(flush_votes)
+
+# Rebuilds every poll's results from the vote interactions, keeping only
+# each user's first vote per poll.
+def reconcile_polls():
+    dedupe_interactions("vote", ["poll_id", "username"])
+    tallies = {}
+    for entry in interactions_collection.aggregate([
+        {"$match": {"type": "vote"}},
+        {"$group": {"_id": {"poll_id": "$poll_id", "answer": "$answer"}, "count": {"$sum": 1}}},
+    ], allowDiskUse=True):
+        tallies.setdefault(entry["_id"]["poll_id"], {})[entry["_id"]["answer"]] = entry["count"]
+
+    operations = []
+    for poll in polls_collection.find({}, {"choices": 1}):
+        counts = tallies.get(poll["_id"], {})
+        results = {result_key(c.strip()): counts.get(c.strip(), 0) for c in poll["choices"] if c.strip()}
+        operations.append(UpdateOne({"_id": poll["_id"]}, {"$set": {"results": results}}))
+    if operations:
+        polls_collection.bulk_write(operations, ordered=False)
+    return len(operations)
+
+@app.cli.command("reconcile-polls")
+def reconcile_polls_command():
+    print(f"Reconciled results for {reconcile_polls()} polls.")
+
+LEADERBOARD_SIZE = int(os.environ.get("LEADERBOARD_SIZE", 10))
+LEADERBOARD_TTL = float(os.environ.get("LEADERBOARD_TTL", 30))
+LEADERBOARD_PUSH_INTERVAL = float(os.environ.get("LEADERBOARD_PUSH_INTERVAL", 5.0))
+LEADERBOARD_ROOM = "leaderboard"
+NO_POLL_DATE = datetime(1970, 1, 1)
+
+# Per-user poll stats in user_stats, one document per user:
+#   total / correct     votes cast / votes matching the quiz's correct answer
+#   streak              consecutive poll days answered correctly, ending at
+#                       last_correct_date
+#   best_streak         longest streak so far
+# Each vote updates its voter's document in one pipeline update, so reads
+# never scan interactions. `flask rebuild-leaderboard` recomputes everything
+# from the vote interactions and should run nightly to repair drift.
+def record_poll_answer(username, day, correct):
+    last_poll_date = {"$ifNull": ["$last_poll_date", NO_POLL_DATE]}  # a new user's document has none
+    stats = {
+        "total": {"$add": [{"$ifNull": ["$total", 0]}, 1]},
+        "correct": {"$add": [{"$ifNull": ["$correct", 0]}, 1 if correct else 0]},
+        "last_poll_date": {"$max": [last_poll_date, day]},
+    }
+    # Only today's poll takes votes, so this should always hold; it keeps a
+    # replayed vote from moving the streak twice in one day.
+    is_new_day = {"$lt": [last_poll_date, day]}
+    if correct:
+        continued = {"$eq": ["$last_correct_date", day - timedelta(days=1)]}
+        stats["streak"] = {"$cond": [
+            is_new_day,
+            {"$cond": [continued, {"$add": [{"$ifNull": ["$streak", 0]}, 1]}, 1]},
+            {"$ifNull": ["$streak", 0]},
+        ]}
+        stats["last_correct_date"] = {"$cond": [is_new_day, day, "$last_correct_date"]}
+    else:
+        stats["streak"] = {"$cond": [is_new_day, 0, {"$ifNull": ["$streak", 0]}]}
+
+    pipeline = [
+        {"$set": stats},
+        {"$set": {"best_streak": {"$max": [{"$ifNull": ["$best_streak", 0]}, "$streak"]}}},
+    ]
+    try:
+        user_stats_collection.update_one({"username": username}, pipeline, upsert=True)
+    except DuplicateKeyError:
+        # Lost an upsert race for a new user's document; it exists now.
+        user_stats_collection.update_one({"username": username}, pipeline)
+    mark_leaderboard_dirty()
+
+LEADERBOARD_PROJECTION = {"_id": 0, "username": 1, "correct": 1, "total": 1, "streak": 1, "best_streak": 1}
+
+leaderboard_cache = TTLCache(1, LEADERBOARD_TTL)
+
+def get_leaderboard():
+    leaders = leaderboard_cache.get("top")
+    if leaders is None:
+        leaders = list(
+            user_stats_collection.find({}, LEADERBOARD_PROJECTION)
+            .sort([("correct", DESCENDING), ("best_streak", DESCENDING), ("username", ASCENDING)])
+            .limit(LEADERBOARD_SIZE)
+        )
+        leaderboard_cache.set("top", leaders)
+    return leaders
+
+def get_user_stats(username):
+    return user_stats_collection.find_one({"username": username}, LEADERBOARD_PROJECTION)
+
+@app.route("/leaderboard", methods=["GET"])
+def leaderboard():
+    return jsonify({"success": True, "leaders": get_leaderboard()})
+
+@socketio.on("joinLeaderboard")
+def join_leaderboard_room(data=None):
+    join_room(LEADERBOARD_ROOM)
+
+# Votes only mark the leaderboard dirty; the push loop re-reads the top N at
+# most every LEADERBOARD_PUSH_INTERVAL and emits only when it changed.
+leaderboard_dirty = False
+leaderboard_lock = threading.Lock()
+last_pushed_leaders = None
+
+def mark_leaderboard_dirty():
+    global leaderboard_dirty
+    with leaderboard_lock:
+        leaderboard_dirty = True
+
+def push_leaderboard():
+    global leaderboard_dirty, last_pushed_leaders
+    with leaderboard_lock:
+        if not leaderboard_dirty:
+            return
+        leaderboard_dirty = False
+
+    leaderboard_cache.clear()
+    leaders = get_leaderboard()
+    if leaders != last_pushed_leaders:
+        last_pushed_leaders = leaders
+        broadcast("leaderboard", {"leaders": leaders}, to=LEADERBOARD_ROOM)
+
+def leaderboard_update_loop():
+    while True:
+        socketio.sleep(LEADERBOARD_PUSH_INTERVAL)
+        try:
+            push_leaderboard()
+        except PyMongoError as e:
+            mark_leaderboard_dirty()
+            logger.warning(f"Could not publish the leaderboard: {e}")
+
+# Recomputes every user's stats from the vote interactions. Correct answers
+# are looked up per poll (one per day), so votes from before the `correct`
+# flag existed are scored too. Votes cast after their poll's day (accepted
+# before submit_poll closed old polls) are not counted, just as submit_poll
+# would not have accepted them.
+def rebuild_leaderboard(batch_size=500):
+    polls = {}
+    for poll in polls_collection.find({}, {"question": 1, "quiz_id": 1, "date": 1}):
+        correct_answer = poll_correct_answer(poll)
+        polls[poll["_id"]] = (poll["date"], correct_answer.strip() if correct_answer is not None else None)
+
+    votes_by_user = interactions_collection.aggregate([
+        {"$match": {"type": "vote"}},
+        {"$group": {"_id": "$username", "votes": {"$push": {"_id": "$_id", "poll_id": "$poll_id", "answer": "$answer"}}}},
+    ], allowDiskUse=True)
+
+    usernames = []
+    operations = []
+    for group in votes_by_user:
+        answers = sorted(
+            (polls[vote["poll_id"]][0], vote["answer"] == polls[vote["poll_id"]][1])
+            for vote in group["votes"]
+            if vote["poll_id"] in polls
+            and poll_day(vote["_id"].generation_time.astimezone(POLL_TIMEZONE)) == polls[vote["poll_id"]][0]
+        )
+        stats = {"username": group["_id"], "total": len(answers), "correct": 0, "streak": 0, "best_streak": 0,
+                 "last_poll_date": None, "last_correct_date": None}
+        for day, correct in answers:
+            if correct:
+                continued = stats["last_correct_date"] == day - timedelta(days=1)
+                stats["streak"] = stats["streak"] + 1 if continued else 1
+                stats["correct"] += 1
+                stats["last_correct_date"] = day
+            else:
+                stats["streak"] = 0
+            stats["best_streak"] = max(stats["best_streak"], stats["streak"])
+            stats["last_poll_date"] = day
+
+        usernames.append(group["_id"])
+        operations.append(ReplaceOne({"username": group["_id"]}, stats, upsert=True))
+        if len(operations) >= batch_size:
+            user_stats_collection.bulk_write(operations, ordered=False)
+            operations = []
+    if operations:
+        user_stats_collection.bulk_write(operations, ordered=False)
+
+    user_stats_collection.delete_many({"username": {"$nin": usernames}})
+    mark_leaderboard_dirty()
+    return len(usernames)
+
+@app.cli.command("rebuild-leaderboard")
+def rebuild_leaderboard_command():
+    print(f"Rebuilt stats for {rebuild_leaderboard()} users.")
+
+background_tasks_started = False
+background_tasks_lock = threading.Lock()
+
+def start_background_tasks():
+    global background_tasks_started
+    with background_tasks_lock:
+        if background_tasks_started:
+            return
+        background_tasks_started = True
+    socketio.start_background_task(poll_rollover_loop)
+    socketio.start_background_task(like_update_loop)
+    socketio.start_background_task(vote_flush_loop)
+    socketio.start_background_task(leaderboard_update_loop)
 
 if __name__ == "__main__":
-    threading.Thread(target=broadcast_timer, daemon=True).start()
-    socketio.run(app, debug=True, host="0.0.0.0", port=8080, allow_unsafe_werkzeug=True)
\ No newline at end of file
+    ensure_indexes()
+    start_background_tasks()
+    debug = os.environ.get("FLASK_DEBUG") == "1"
+    run_options = {"allow_unsafe_werkzeug": True} if SERVER_MODE == "threading" else {}
+    socketio.run(app, debug=debug, use_reloader=False, host="0.0.0.0", port=int(os.environ.get("PORT", 8080)), **run_options)
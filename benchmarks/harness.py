@@ -0,0 +1,323 @@
+# Load-testing harness for the hot paths in app.py.
+#
+#   pip install -r benchmarks/requirements.txt
+#   python -m benchmarks.harness                              # in-process mongomock
+#   python -m benchmarks.harness --mongo-uri mongodb://localhost:27017
+#   python -m benchmarks.harness --scenarios dashboard,like_storm --output bench.jsonl
+#
+# The app runs in this process behind Flask's test client, and Socket.IO
+# clients are registered with the servers directly, so results measure app + database cost without network noise.
+# Every scenario reports p50/p99 latency and throughput; --output appends one
+# JSON line per scenario tagged with the current git commit so runs can be
+# compared across commits. Use a local mongod for numbers that reflect
+# production: mongomock is much slower than a real server on large collections
+# and does not model indexes.
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+SCENARIOS = ["login_burst", "dashboard", "like_storm", "poll_vote_rush", "broadcast_fanout"]
+REMOTE_ADDR = "127.0.0.1"
+PASSWORD = "benchmark-password"
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else 0.0
+
+
+def summarize(name, latencies, elapsed, errors=0, **extra):
+    result = {
+        "scenario": name,
+        "requests": len(latencies),
+        "errors": errors,
+        "req_per_s": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+    }
+    result.update(extra)
+    return result
+
+
+def run_concurrently(call, items, concurrency):
+    def timed(item):
+        start = time.perf_counter()
+        ok = call(item)
+        return time.perf_counter() - start, ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(timed, items))
+    elapsed = time.perf_counter() - start
+    latencies = [latency for latency, _ in outcomes]
+    errors = sum(1 for _, ok in outcomes if not ok)
+    return latencies, elapsed, errors
+
+
+class Harness:
+    def __init__(self, app_module, args):
+        self.app_module = app_module
+        self.app = app_module.app
+        self.args = args
+        self.password_hash = app_module._bcrypt_hash(PASSWORD, app_module.BCRYPT_LOG_ROUNDS)
+
+    # -- fixtures ---------------------------------------------------------
+
+    def create_users(self, prefix, count):
+        users = []
+        for i in range(count):
+            username = f"{prefix}{i}"
+            raw_token = username + REMOTE_ADDR
+            users.append({
+                "username": username,
+                "email": f"{username}@bench.local",
+                "password": self.password_hash,
+                "auth_token": hashlib.sha256(raw_token.encode()).hexdigest(),
+            })
+        self.app_module.users_collection.insert_many(users)
+        return [(user["username"], user["username"] + REMOTE_ADDR) for user in users]
+
+    def seed_quizzes(self, count):
+        quizzes_collection = self.app_module.quizzes_collection
+        quizzes_collection.delete_many({})
+        self.app_module.fragment_cache.clear()
+        batch = []
+        for i in range(count):
+            batch.append(self.app_module.build_quiz(
+                f"Benchmark quiz {i}",
+                [(f"Question {q} of quiz {i}?", ["A", "B", "C", "D"], "B") for q in range(10)],
+                "bench",
+            ))
+            if len(batch) == 1000:
+                quizzes_collection.insert_many(batch)
+                batch = []
+        if batch:
+            quizzes_collection.insert_many(batch)
+
+    def request(self, method, path, session=None, **kwargs):
+        client = self.app.test_client()
+        if session:
+            username, raw_token = session
+            client.set_cookie("username", username)
+            client.set_cookie("auth_token", raw_token)
+        return client.open(path, method=method, environ_base={"REMOTE_ADDR": REMOTE_ADDR}, **kwargs)
+
+    # -- scenarios --------------------------------------------------------
+
+    def login_burst(self):
+        users = self.create_users("login", self.args.requests)
+
+        def login(session):
+            response = self.request("POST", "/login", data={"email": f"{session[0]}@bench.local", "password": PASSWORD})
+            return response.status_code == 302
+
+        latencies, elapsed, errors = run_concurrently(login, users, self.args.concurrency)
+        return [summarize("login_burst", latencies, elapsed, errors,
+                          bcrypt_rounds=self.app_module.BCRYPT_LOG_ROUNDS,
+                          bcrypt_pool_size=self.app_module.BCRYPT_POOL_SIZE)]
+
+    def dashboard(self):
+        results = []
+        sessions = self.create_users("reader", self.args.concurrency)
+        for quiz_count in self.args.quiz_counts:
+            self.seed_quizzes(quiz_count)
+            self.request("GET", "/dashboard", session=sessions[0])  # create the daily poll, warm caches
+
+            def read(i):
+                return self.request("GET", "/dashboard", session=sessions[i % len(sessions)]).status_code == 200
+
+            latencies, elapsed, errors = run_concurrently(read, range(self.args.requests), self.args.concurrency)
+            results.append(summarize(f"dashboard_{quiz_count}", latencies, elapsed, errors, quizzes=quiz_count))
+        return results
+
+    def like_storm(self):
+        self.seed_quizzes(max(1, self.args.fanout_quizzes))
+        quiz = self.app_module.quizzes_collection.find_one({}, {"_id": 1})
+        sessions = self.create_users("liker", self.args.requests)
+
+        def like(session):
+            response = self.request("POST", "/interact", session=session, data={"quiz_id": str(quiz["_id"]), "type": "like"})
+            return response.status_code == 200
+
+        latencies, elapsed, errors = run_concurrently(like, sessions, self.args.concurrency)
+        self.app_module.flush_like_updates()
+
+        # Every liker liked exactly once, so the counter must match exactly.
+        likes = self.app_module.quizzes_collection.find_one({"_id": quiz["_id"]}, {"likes": 1}).get("likes", 0)
+        recorded = self.app_module.interactions_collection.count_documents({"quiz_id": quiz["_id"], "type": "like"})
+        return [summarize("like_storm", latencies, elapsed, errors, likes=likes, like_interactions=recorded,
+                          consistent=likes == recorded == len(sessions))]
+
+    def poll_vote_rush(self):
+        self.seed_quizzes(max(1, self.args.fanout_quizzes))
+        daily_poll, _ = self.app_module.get_daily_poll()
+        sessions = self.create_users("voter", self.args.requests)
+        choices = [c.strip() for c in daily_poll["choices"] if c.strip()]
+
+        def vote(item):
+            i, session = item
+            response = self.request("POST", "/submit_poll", session=session,
+                                    json={"poll_id": str(daily_poll["_id"]), "selected_answer": choices[i % len(choices)]})
+            return response.status_code == 200
+
+        latencies, elapsed, errors = run_concurrently(vote, list(enumerate(sessions)), self.args.concurrency)
+        flush_start = time.perf_counter()
+        self.app_module.flush_votes()
+        flush_ms = round((time.perf_counter() - flush_start) * 1000, 2)
+
+        results = self.app_module.polls_collection.find_one({"_id": daily_poll["_id"]}, {"results": 1}).get("results", {})
+        return [summarize("poll_vote_rush", latencies, elapsed, errors, flush_ms=flush_ms,
+                          votes_recorded=sum(results.values()))]
+
+    def broadcast_fanout(self):
+        # Two "nodes" in one process: the app's Socket.IO server (node A) and a
+        # second server (node B) joined through the same local:// queue. Half
+        # the clients connect to each; one like on node A must reach all.
+        # Flask-SocketIO's test client refuses to run with a message queue, so
+        # clients are registered with each server's manager directly and
+        # "delivery" is the moment the server hands the packet to engine.io.
+        import socketio
+
+        app_module = self.app_module
+        node_a = app_module.socketio.server
+        node_b = socketio.Server(async_mode="threading",
+                                 client_manager=app_module.LocalPubSubManager(channel=self.args.channel))
+
+        self.seed_quizzes(max(1, self.args.fanout_quizzes))
+        quiz_id = str(app_module.quizzes_collection.find_one({}, {"_id": 1})["_id"])
+        room = app_module.quiz_room(quiz_id)
+
+        delivery = {}
+        start = None
+
+        def capture(eio_sid, packet):
+            delivery.setdefault(eio_sid, time.perf_counter() - start)
+
+        subscribers = len(app_module.LocalPubSubManager.subscribers.get(self.args.channel, []))
+        for node in (node_a, node_b):
+            node._send_eio_packet = capture
+            if not node.manager_initialized:
+                node.manager_initialized = True
+                node.manager.initialize()
+                subscribers += 1
+        deadline = time.perf_counter() + self.args.fanout_timeout
+        while len(app_module.LocalPubSubManager.subscribers.get(self.args.channel, [])) < subscribers:
+            if time.perf_counter() > deadline:
+                raise RuntimeError("Socket.IO nodes never subscribed to the message queue.")
+            time.sleep(0.01)
+
+        for i in range(self.args.clients):
+            node = node_a if i % 2 == 0 else node_b
+            eio_sid = f"{'a' if node is node_a else 'b'}{i}"
+            node.manager.enter_room(node.manager.connect(eio_sid, "/"), "/", room)
+
+        liker = self.create_users("fanout", 1)[0]
+        self.request("POST", "/interact", session=liker, data={"quiz_id": quiz_id, "type": "like"})
+        start = time.perf_counter()
+        app_module.flush_like_updates()
+
+        deadline = start + self.args.fanout_timeout
+        while len(delivery) < self.args.clients and time.perf_counter() < deadline:
+            time.sleep(0.001)
+
+        reached_node_b = sum(1 for eio_sid in delivery if eio_sid.startswith("b"))
+        latencies = list(delivery.values())
+        elapsed = max(latencies) if latencies else 0.0
+        return [summarize("broadcast_fanout", latencies, elapsed or 1.0, self.args.clients - len(delivery),
+                          clients=self.args.clients, delivered=len(delivery),
+                          delivered_node_b=reached_node_b, clients_node_b=self.args.clients // 2)]
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark app.py hot paths against a local Mongo stand-in.")
+    parser.add_argument("--mongo-uri", help="run against this mongod instead of mongomock")
+    parser.add_argument("--db", default=f"bench_{os.getpid()}", help="database to create (dropped afterwards)")
+    parser.add_argument("--keep-db", action="store_true")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=500, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--quiz-counts", default="1000,10000", help="dashboard collection sizes")
+    parser.add_argument("--clients", type=int, default=200, help="Socket.IO clients for broadcast_fanout")
+    parser.add_argument("--fanout-quizzes", type=int, default=100)
+    parser.add_argument("--fanout-timeout", type=float, default=10.0)
+    parser.add_argument("--bcrypt-rounds", type=int, default=12)
+    parser.add_argument("--bcrypt-pool-size", type=int, default=None)
+    parser.add_argument("--channel", default="bench-socketio")
+    parser.add_argument("--output", help="append JSON results to this file")
+    args = parser.parse_args()
+    args.quiz_counts = [int(count) for count in args.quiz_counts.split(",")]
+    return args
+
+
+def main():
+    args = parse_args()
+
+    # app.py reads its configuration at import time.
+    os.environ.update({
+        "SERVER_MODE": "threading",
+        "MONGO_URI": args.mongo_uri or "mongodb://localhost:27017",
+        "MONGO_DB": args.db,
+        "RATE_LIMIT_ENABLED": "0",
+        "LOG_SAMPLE_RATE": "0",
+        "BCRYPT_LOG_ROUNDS": str(args.bcrypt_rounds),
+        "SOCKETIO_MESSAGE_QUEUE": "local://",
+        "SOCKETIO_CHANNEL": args.channel,
+    })
+    if args.bcrypt_pool_size is not None:
+        os.environ["BCRYPT_POOL_SIZE"] = str(args.bcrypt_pool_size)
+    if not args.mongo_uri:
+        import mongomock
+        import pymongo
+        pymongo.MongoClient = mongomock.MongoClient
+
+        # mongomock edits the projection dict it is given in place, which
+        # races when threads share app.py's module-level projections.
+        find = mongomock.collection.Collection.find
+
+        def find_with_private_projection(self, filter=None, projection=None, *args, **kwargs):
+            return find(self, filter, dict(projection) if isinstance(projection, dict) else projection, *args, **kwargs)
+        mongomock.collection.Collection.find = find_with_private_projection
+
+    import app as app_module
+    app_module.app.config["TESTING"] = True
+    app_module.ensure_indexes()
+
+    harness = Harness(app_module, args)
+    commit = git_commit()
+    backend = "mongod" if args.mongo_uri else "mongomock"
+    results = []
+    try:
+        for name in args.scenarios.split(","):
+            for result in getattr(harness, name)():
+                result.update(commit=commit, backend=backend, concurrency=args.concurrency, ts=int(time.time()))
+                results.append(result)
+                print(json.dumps(result), flush=True)
+    finally:
+        if not args.keep_db:
+            app_module.mongo_client.drop_database(args.db)
+
+    if args.output:
+        with open(args.output, "a") as f:
+            for result in results:
+                f.write(json.dumps(result) + "\n")
+
+    print(f"\n{'scenario':<20} {'req/s':>10} {'p50 ms':>10} {'p99 ms':>10} {'errors':>8}")
+    for result in results:
+        print(f"{result['scenario']:<20} {result['req_per_s']:>10} {result['p50_ms']:>10} {result['p99_ms']:>10} {result['errors']:>8}")
+    return 1 if any(result["errors"] for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+# Login throughput vs. bcrypt pool size.
+#
+#   python -m benchmarks.login_throughput --rounds 12 --logins 200
+#
+# Each row simulates --concurrency clients logging in at once. It checks a
+# password with the same worker function and process pool setup that app.py
+# uses; pool size 0 is the old inline behaviour (hashing on the request thread).
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from app import _bcrypt_check, _bcrypt_hash
+
+PASSWORD = "benchmark-password"
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def measure(pool_size, stored_password, logins, concurrency):
+    pool = None
+    if pool_size > 0:
+        pool = ProcessPoolExecutor(max_workers=pool_size, mp_context=multiprocessing.get_context("spawn"))
+        # Start every worker before timing.
+        list(pool.map(_bcrypt_check, [stored_password] * pool_size, [PASSWORD] * pool_size))
+
+    def login(_):
+        start = time.perf_counter()
+        if pool:
+            pool.submit(_bcrypt_check, stored_password, PASSWORD).result()
+        else:
+            _bcrypt_check(stored_password, PASSWORD)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as clients:
+        latencies = list(clients.map(login, range(logins)))
+    elapsed = time.perf_counter() - start
+
+    if pool:
+        pool.shutdown()
+    return logins / elapsed, percentile(latencies, 0.5), percentile(latencies, 0.99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Login throughput vs. bcrypt pool size.")
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt work factor")
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--pool-sizes", default=None, help="comma-separated, default 0,1,2,4,...,cpu_count")
+    args = parser.parse_args()
+
+    if args.pool_sizes:
+        pool_sizes = [int(size) for size in args.pool_sizes.split(",")]
+    else:
+        pool_sizes = [0]
+        size = 1
+        while size <= (os.cpu_count() or 1):
+            pool_sizes.append(size)
+            size *= 2
+
+    stored_password = _bcrypt_hash(PASSWORD, args.rounds)
+    print(f"rounds={args.rounds} logins={args.logins} concurrency={args.concurrency}")
+    print(f"{'pool':>6} {'logins/s':>10} {'p50 ms':>10} {'p99 ms':>10}")
+    for pool_size in pool_sizes:
+        throughput, p50, p99 = measure(pool_size, stored_password, args.logins, args.concurrency)
+        print(f"{pool_size:>6} {throughput:>10.1f} {p50 * 1000:>10.1f} {p99 * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# Fingerprints and precompresses everything in Frontend/static for production:
+#
+#   python build_assets.py
+#
+# Each asset is copied to Frontend/static/dist/<name>.<hash>.<ext> (plus .gz and,
+# when the brotli package is installed, .br variants for text assets) and
+# dist/manifest.json maps original names to the hashed ones. Templates link
+# assets through asset_url(), which reads that manifest and falls back to the
+# plain /static/ path when no build has been run.
+import gzip
+import hashlib
+import json
+import os
+import shutil
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Frontend", "static")
+DIST_DIR = os.path.join(STATIC_DIR, "dist")
+MANIFEST_NAME = "manifest.json"
+ASSET_EXTENSIONS = {".css", ".js", ".jpg", ".jpeg", ".png", ".gif", ".svg", ".ico"}
+COMPRESSIBLE_EXTENSIONS = {".css", ".js", ".svg"}
+
+
+def write_file(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def build():
+    shutil.rmtree(DIST_DIR, ignore_errors=True)
+    os.makedirs(DIST_DIR)
+
+    manifest = {}
+    for name in sorted(os.listdir(STATIC_DIR)):
+        source = os.path.join(STATIC_DIR, name)
+        base, extension = os.path.splitext(name)
+        if not os.path.isfile(source) or extension.lower() not in ASSET_EXTENSIONS:
+            continue
+
+        with open(source, "rb") as f:
+            data = f.read()
+        hashed_name = f"{base}.{hashlib.sha256(data).hexdigest()[:12]}{extension}"
+        target = os.path.join(DIST_DIR, hashed_name)
+        write_file(target, data)
+
+        if extension.lower() in COMPRESSIBLE_EXTENSIONS:
+            write_file(target + ".gz", gzip.compress(data, compresslevel=9, mtime=0))
+            if brotli:
+                write_file(target + ".br", brotli.compress(data, quality=11))
+
+        manifest[name] = f"dist/{hashed_name}"
+
+    with open(os.path.join(DIST_DIR, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+if __name__ == "__main__":
+    manifest = build()
+    print(f"Built {len(manifest)} assets into {DIST_DIR}" + ("" if brotli else " (brotli not installed, gzip only)"))
@@ -0,0 +1,31 @@
+import os
+import sys
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8080')}"
+
+# eventlet or gevent: every websocket is a green thread instead of an OS thread.
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "eventlet")
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", 5000))
+
+# More than one worker needs SOCKETIO_MESSAGE_QUEUE so broadcasts reach clients
+# connected to the other workers.
+workers = int(os.environ.get("GUNICORN_WORKERS", 1))
+
+# app.py reads SERVER_MODE to pick the matching Socket.IO async mode and
+# monkey-patches for eventlet or gevent, so only green worker classes may
+# select those modes; thread-based workers (sync, gthread) run "threading".
+# Dotted paths such as geventwebsocket's GeventWebSocketWorker count too.
+server_mode = next((mode for mode in ("gevent", "eventlet") if mode in worker_class.lower()), "threading")
+raw_env = [f"SERVER_MODE={server_mode}"]
+
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+graceful_timeout = 10
+accesslog = None
+
+
+def worker_exit(server, worker):
+    # Stop the bcrypt process pool while the worker can still run its
+    # management thread; see shutdown_password_pool in app.py.
+    app = sys.modules.get("app")
+    if app is not None:
+        app.shutdown_password_pool()
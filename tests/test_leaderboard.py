@@ -0,0 +1,91 @@
+# Incremental user stats (record_poll_answer, run per vote) must agree with
+# the nightly rebuild from the vote interactions.
+from datetime import timedelta
+
+import mongomock
+import pytest
+from bson import ObjectId
+
+import app
+
+DAY_ONE = app.poll_day() - timedelta(days=30)
+
+# (username, day offset, answered correctly)
+VOTES = [
+    ("ann", 0, True),
+    ("ann", 1, True),
+    ("ann", 2, False),
+    ("ann", 3, True),
+    ("ann", 4, True),
+    ("ann", 5, True),
+    ("bob", 0, False),
+    ("bob", 2, True),
+    ("bob", 3, True),
+    ("bob", 5, True),
+    ("cat", 4, True),
+]
+
+STATS_FIELDS = ("total", "correct", "streak", "best_streak", "last_poll_date", "last_correct_date")
+
+
+@pytest.fixture
+def db(monkeypatch):
+    database = mongomock.MongoClient().db
+    for name in ("quizzes", "polls", "interactions", "user_stats"):
+        monkeypatch.setattr(app, f"{name}_collection", database[name])
+    return database
+
+
+def cast_vote(db, quiz_id, username, day, correct, minute):
+    poll = db.polls.find_one({"date": day})
+    if not poll:
+        poll_id = db.polls.insert_one({"date": day, "quiz_id": quiz_id, "question": "Q?", "choices": ["yes", "no"]}).inserted_id
+    else:
+        poll_id = poll["_id"]
+    # from_datetime ids only differ by time, so each vote gets its own minute.
+    cast_at = app.POLL_TIMEZONE.localize(day + timedelta(hours=12, minutes=minute))
+    db.interactions.insert_one({
+        "_id": ObjectId.from_datetime(cast_at),
+        "poll_id": poll_id,
+        "username": username,
+        "type": "vote",
+        "answer": "yes" if correct else "no",
+    })
+    app.record_poll_answer(username, day, correct)
+
+
+def user_stats(db):
+    return {
+        stats["username"]: {field: stats.get(field) for field in STATS_FIELDS}
+        for stats in db.user_stats.find()
+    }
+
+
+def test_first_correct_vote_starts_a_streak(db):
+    app.record_poll_answer("ann", DAY_ONE, True)
+
+    stats = db.user_stats.find_one({"username": "ann"})
+    assert (stats["total"], stats["correct"], stats["streak"], stats["best_streak"]) == (1, 1, 1, 1)
+    assert stats["last_correct_date"] == DAY_ONE
+
+
+def test_incremental_stats_match_rebuild(db):
+    quiz_id = db.quizzes.insert_one({"questions": {"Q?": {"choices": ["yes", "no"], "correct_answer": "yes"}}}).inserted_id
+    for minute, (username, offset, correct) in enumerate(VOTES):
+        cast_vote(db, quiz_id, username, DAY_ONE + timedelta(days=offset), correct, minute)
+    incremental = user_stats(db)
+
+    assert app.rebuild_leaderboard() == 3
+    assert user_stats(db) == incremental
+    assert incremental["ann"]["streak"] == 3 and incremental["ann"]["best_streak"] == 3
+    assert incremental["bob"]["streak"] == 1 and incremental["bob"]["best_streak"] == 2
+
+
+def test_rebuild_ignores_votes_cast_after_the_poll_day(db):
+    quiz_id = db.quizzes.insert_one({"questions": {"Q?": {"choices": ["yes", "no"], "correct_answer": "yes"}}}).inserted_id
+    poll_id = db.polls.insert_one({"date": DAY_ONE, "quiz_id": quiz_id, "question": "Q?", "choices": ["yes", "no"]}).inserted_id
+    db.interactions.insert_one({"poll_id": poll_id, "username": "ann", "type": "vote", "answer": "yes"})
+
+    app.rebuild_leaderboard()
+
+    assert db.user_stats.find_one({"username": "ann"})["correct"] == 0
@@ -0,0 +1,59 @@
+# Two Socket.IO "nodes" in one process, joined by LocalPubSubManager: an emit
+# on node A must reach a client connected to node B.
+import queue
+import time
+
+import socketio
+
+from app import LocalPubSubManager
+
+
+def make_node(channel):
+    return socketio.Server(async_mode="threading", client_manager=LocalPubSubManager(channel=channel))
+
+
+def connect_client(node, room):
+    # Register a client with the node's manager and capture what would be sent
+    # to it, without running an engine.io transport.
+    received = queue.Queue()
+    node._send_eio_packet = lambda eio_sid, eio_packet: received.put((eio_sid, socketio.packet.Packet(encoded_packet=eio_packet.data)))
+    sid = node.manager.connect("eio-client", "/")
+    node.manager.enter_room(sid, "/", room)
+    return received
+
+
+def start_listening(node, channel):
+    subscribers = len(LocalPubSubManager.subscribers.get(channel, []))
+    node.manager_initialized = True
+    node.manager.initialize()
+    deadline = time.monotonic() + 5
+    while len(LocalPubSubManager.subscribers.get(channel, [])) == subscribers:
+        assert time.monotonic() < deadline, "node never subscribed to the queue"
+        time.sleep(0.01)
+
+
+def test_emit_on_node_a_reaches_client_on_node_b():
+    channel = "test-fanout"
+    node_a = make_node(channel)
+    node_b = make_node(channel)
+    received = connect_client(node_b, "quiz:abc")
+    start_listening(node_b, channel)
+
+    node_a.emit("like_quiz", {"quiz_id": "abc", "likes_count": 3}, room="quiz:abc")
+
+    eio_sid, packet = received.get(timeout=5)
+    assert eio_sid == "eio-client"
+    assert packet.data == ["like_quiz", {"quiz_id": "abc", "likes_count": 3}]
+
+
+def test_emit_skips_clients_outside_the_room():
+    channel = "test-rooms"
+    node_a = make_node(channel)
+    node_b = make_node(channel)
+    received = connect_client(node_b, "quiz:other")
+    start_listening(node_b, channel)
+
+    node_a.emit("like_quiz", {"quiz_id": "abc", "likes_count": 3}, room="quiz:abc")
+
+    time.sleep(0.2)
+    assert received.empty()
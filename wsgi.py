@@ -0,0 +1,6 @@
+# Entry point for gunicorn (see gunicorn.conf.py). Each worker imports this
+# module once, so indexes and background tasks are set up once per process.
+from app import app, ensure_indexes, start_background_tasks
+
+ensure_indexes()
+start_background_tasks()